@@ -0,0 +1,151 @@
+import json
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select, func, and_, or_
+from database import bulk_insert
+import models
+
+CI = models.CollectedItem
+FLAG_COUNTS = list(models.ITEM_FLAGS)
+# Count columns that mean "this term column is non-empty".
+HIT_COUNTS = {"sensational": "sensational_terms", "loaded": "loaded_terms", "monetized": "monetization"}
+COUNTS = list(HIT_COUNTS) + FLAG_COUNTS
+TERMS = {"sensational": "sensational_terms", "loaded": "loaded_terms", "affiliations": "affiliations_found",
+         "ideologies": "ideology_hits"}
+ITEM_COLUMNS = ["date", *FLAG_COUNTS, *dict.fromkeys([*HIT_COUNTS.values(), *TERMS.values()])]
+
+def _month_filter(months):
+    # Range tests on the ISO date string, so the (job_id, date) index serves them; "" is undated items.
+    conds = [CI.date == "" if m == "" else and_(CI.date >= m, CI.date < m + "~") for m in months]
+    return or_(*conds)
+
+def _items_frame(db, job_id, months=None):
+    stmt = select(*[getattr(CI, c) for c in ITEM_COLUMNS]).where(CI.job_id == job_id)
+    if months is not None:
+        stmt = stmt.where(_month_filter(months))
+    return pd.DataFrame.from_records(db.execute(stmt).all(), columns=ITEM_COLUMNS)
+
+def _frequencies(df, key, column):
+    # {key value: {term: n}} for a ", "-joined term column.
+    hits = df.loc[df[column].fillna("") != "", [key, column]]
+    if hits.empty:
+        return {}
+    freq = hits.assign(term=hits[column].str.split(", ")).explode("term").groupby([key, "term"]).size()
+    out = {}
+    for (k, term), n in freq.items():
+        out.setdefault(k, {})[term] = int(n)
+    return out
+
+def month_rollups(df):
+    # Items -> one row per month with every count and term frequency, computed column-wise.
+    if df.empty:
+        return []
+    df = df.assign(month=df["date"].fillna("").str[:7])
+    for name, column in HIT_COUNTS.items():
+        df[name] = df[column].fillna("") != ""
+    grouped = df.groupby("month")
+    counts = grouped[COUNTS].sum().astype(int)
+    counts["items"] = grouped.size()
+    terms = {name: _frequencies(df, "month", column) for name, column in TERMS.items()}
+    mix = _frequencies(df, "month", "monetization")
+    return [{"month": month, **{k: int(v) for k, v in row.items()},
+             "terms_json": json.dumps({name: terms[name].get(month, {}) for name in TERMS}),
+             "monetization_json": json.dumps(mix.get(month, {}))}
+            for month, row in counts.iterrows()]
+
+def _total(rows):
+    # Job totals are the sum of its months; term frequencies are summed the same way.
+    frame = pd.DataFrame.from_records(rows, columns=["items", *COUNTS])
+    total = {k: int(v) for k, v in frame.sum().items()} if rows else {k: 0 for k in ["items", *COUNTS]}
+    long = pd.DataFrame.from_records(
+        [(name, term, n) for r in rows for name, freq in json.loads(r["terms_json"]).items() for term, n in freq.items()],
+        columns=["name", "term", "n"])
+    terms = {name: {} for name in TERMS}
+    for (name, term), n in long.groupby(["name", "term"])["n"].sum().items():
+        terms[name][term] = int(n)
+    mix = pd.DataFrame.from_records(
+        [(kind, n) for r in rows for kind, n in json.loads(r["monetization_json"]).items()], columns=["kind", "n"])
+    total["terms_json"] = json.dumps(terms)
+    total["monetization_json"] = json.dumps({k: int(n) for k, n in mix.groupby("kind")["n"].sum().items()})
+    return total
+
+def refresh(db, job_id, months=None):
+    # Recompute the rollups touched by changed items: the given months (all of them when None, or
+    # when the job has no rollup yet), then the job total from its month rows.
+    R, M = models.JobRollup, models.MonthRollup
+    if months is not None and not db.query(R.id).filter_by(job_id=job_id).first():
+        months = None
+    if months is not None:
+        months = sorted(set(months))
+        if not months:
+            return
+    rows = month_rollups(_items_frame(db, job_id, months))
+    first, last = db.query(func.min(CI.date), func.max(CI.date)).filter(CI.job_id == job_id, CI.date != "").one()
+    db.commit()  # end the read snapshot before writing (see jobqueue.claim)
+    stale = db.query(M).filter(M.job_id == job_id)
+    if months is not None:
+        stale = stale.filter(M.month.in_(months))
+    stale.delete(synchronize_session=False)
+    bulk_insert(db, M, [{"job_id": job_id, "updated_at": datetime.utcnow(), **r} for r in rows])
+    cols = ["items", *COUNTS, "terms_json", "monetization_json"]
+    all_months = [dict(zip(cols, r)) for r in db.query(*[getattr(M, c) for c in cols]).filter(M.job_id == job_id)]
+    values = {**_total(all_months), "first_date": first or "", "last_date": last or "", "updated_at": datetime.utcnow()}
+    if not db.query(R).filter_by(job_id=job_id).update(values, synchronize_session=False):
+        db.add(R(job_id=job_id, **values))
+    db.commit()
+
+def clear(db, job_id):
+    db.query(models.MonthRollup).filter_by(job_id=job_id).delete(synchronize_session=False)
+    db.query(models.JobRollup).filter_by(job_id=job_id).delete(synchronize_session=False)
+
+def job_rollup(db, job_id):
+    # Built on first use for jobs collected before rollups existed.
+    row = db.query(models.JobRollup).filter_by(job_id=job_id).first()
+    if row is None:
+        refresh(db, job_id)
+        row = db.query(models.JobRollup).filter_by(job_id=job_id).first()
+    return row
+
+def report_aggregates(rollup):
+    # The figures the job report needs, from its rollup.
+    total = max(1, rollup.items)
+    terms = json.loads(rollup.terms_json or "{}")
+    agg = {"total": rollup.items, "sensational_rate": rollup.sensational / total, "us_them_rate": rollup.us_vs_them / total,
+           "explicit_rate": rollup.explicit_language / total, "monetized_rate": rollup.monetized / total,
+           "affiliations": set(terms.get("affiliations", {})), "ideologies": set(terms.get("ideologies", {}))}
+    agg.update({f: getattr(rollup, f) > 0 for f in FLAG_COUNTS[2:]})
+    return agg
+
+def _out(frame, top):
+    # Rates for a frame of rollup rows, divided column-wise; term maps trimmed to the top N.
+    rates = frame[COUNTS].div(frame["items"].clip(lower=1), axis=0).round(4)
+    out = []
+    for (_, row), (_, r) in zip(frame.iterrows(), rates.iterrows()):
+        terms = json.loads(row["terms_json"] or "{}")
+        out.append({"items": int(row["items"]), "rates": r.to_dict(),
+                    "top_terms": {name: dict(sorted(freq.items(), key=lambda kv: (-kv[1], kv[0]))[:top])
+                                  for name, freq in terms.items()},
+                    "monetization": json.loads(row["monetization_json"] or "{}")})
+    return out
+
+def timeline(db, job_id, since=None, until=None, top=10):
+    job_rollup(db, job_id)
+    M = models.MonthRollup
+    q = db.query(M).filter(M.job_id == job_id, M.month != "")
+    if since:
+        q = q.filter(M.month >= since)
+    if until:
+        q = q.filter(M.month <= until)
+    rows = q.order_by(M.month.asc()).all()
+    frame = pd.DataFrame.from_records([{c: getattr(r, c) for c in ["month", "items", *COUNTS, "terms_json", "monetization_json"]}
+                                       for r in rows], columns=["month", "items", *COUNTS, "terms_json", "monetization_json"])
+    return [{"month": m, **o} for m, o in zip(frame["month"], _out(frame, top))]
+
+def compare(db, job_ids, top=10):
+    J = models.CreatorJob
+    names = dict(db.query(J.id, J.name).filter(J.id.in_(job_ids)))
+    rollups = [job_rollup(db, jid) for jid in job_ids if jid in names]
+    cols = ["job_id", "items", *COUNTS, "terms_json", "monetization_json", "first_date", "last_date"]
+    frame = pd.DataFrame.from_records([{c: getattr(r, c) for c in cols} for r in rollups], columns=cols)
+    return [{"job_id": int(jid), "creator": names[jid], "first_date": first or None, "last_date": last or None, **o}
+            for jid, first, last, o in zip(frame["job_id"], frame["first_date"], frame["last_date"], _out(frame, top))]
@@ -0,0 +1,121 @@
+import argparse, json, os, platform, subprocess, sys, tempfile, time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.standin import StandIn
+
+class Context:
+    def __init__(self, standin, quick, repeat, concurrency):
+        self.standin, self.quick, self.repeat, self.concurrency = standin, quick, repeat, concurrency
+
+    def size(self, full, quick):
+        return quick if self.quick else full
+
+def _git_sha():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _flatten(d, prefix=""):
+    for k, v in d.items():
+        if isinstance(v, dict):
+            yield from _flatten(v, f"{prefix}{k}.")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield f"{prefix}{k}", v
+
+def compare(baseline, results):
+    # Medians and throughputs side by side; for *_ms lower is better, for *_per_sec/minute higher is.
+    old = dict(_flatten(baseline.get("scenarios", {})))
+    lines = []
+    for key, new in _flatten(results["scenarios"]):
+        if key not in old or not old[key] or not key.endswith(("median_ms", "per_sec", "per_minute")):
+            continue
+        change = (new - old[key]) / old[key] * 100.0
+        worse = change > 0 if key.endswith("_ms") else change < 0
+        lines.append(f"{key:60s} {old[key]:>12.3f} -> {new:>12.3f}  {change:+7.1f}%{'  (worse)' if worse and abs(change) >= 10 else ''}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="Benchmark creator-profiler against a local stand-in.")
+    parser.add_argument("--scenarios", default="analyze_text,parse_feed,run_job,process_queue,endpoints",
+                        help="comma-separated: analyze_text, parse_feed, run_job, process_queue, endpoints")
+    parser.add_argument("--quick", action="store_true", help="small sizes, for a smoke run")
+    parser.add_argument("--repeat", type=int, default=None, help="timed repetitions per measurement")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay the stand-in adds to every response")
+    parser.add_argument("--api-latency-ms", type=float, default=None, help="delay for YouTube/SerpAPI/OpenAI only")
+    parser.add_argument("--concurrency", type=int, default=4, help="worker slots for process_queue")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the production per-provider rate limits")
+    parser.add_argument("--out", default=None, help="results file (default bench/results/<utc>-<sha>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    # Resolve user paths before moving into the scratch directory.
+    out = os.path.abspath(args.out) if args.out else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    latencies = {}
+    if args.api_latency_ms is not None:
+        latencies = {p: args.api_latency_ms / 1000.0 for p in ("/youtube/v3", "/serpapi", "/openai")}
+    standin = StandIn(latency=args.latency_ms / 1000.0, latencies=latencies).start()
+    workdir = tempfile.mkdtemp(prefix="creator-profiler-bench-")
+    # Everything the app reads from the environment at import time has to be in place first.
+    os.environ.update(standin.env())
+    os.environ.update({"DATABASE_URL": f"sqlite:///{workdir}/bench.db", "RESULT_CACHE_BYPASS": "1",
+                       "YOUTUBE_API_KEY": "bench", "SERPAPI_KEY": "bench", "OPENAI_API_KEY": "bench",
+                       "EMBEDDED_WORKER": ""})
+    # Every synthetic feed is served by the one stand-in host, so the per-domain job limit would hold
+    # process_queue to QUEUE_DOMAIN_CONCURRENCY jobs at a time whatever --concurrency says.
+    os.environ.setdefault("QUEUE_DOMAIN_CONCURRENCY", str(args.concurrency))
+    if not args.rate_limits:
+        os.environ.update({f"HTTP_RATE_{p}": "10000/10000" for p in ("YOUTUBE", "SERPAPI", "OPENAI", "FEED")})
+    os.chdir(workdir)  # the database lands in the scratch directory
+
+    from database import migrate
+    from bench.scenarios import SCENARIOS
+    migrate()
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    ctx = Context(standin, args.quick, args.repeat or (3 if args.quick else 10), args.concurrency)
+    results = {"meta": {"git_sha": _git_sha(), "started_at": datetime.now(timezone.utc).isoformat(),
+                        "python": sys.version.split()[0], "platform": platform.platform(),
+                        "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}},
+               "scenarios": {}}
+    for name in names:
+        t0 = time.perf_counter()
+        print(f"{name} ...", file=sys.stderr, flush=True)
+        results["scenarios"][name] = SCENARIOS[name](ctx)
+        print(f"{name} done in {time.perf_counter() - t0:.1f}s", file=sys.stderr, flush=True)
+    results["meta"]["standin_hits"] = dict(standin.hits)
+    # Connection reuse per host and request/retry/throttle counts per provider, for the whole run.
+    from http_client import HTTP
+    results["meta"]["http"] = HTTP.stats()
+    standin.stop()
+    # Scenarios that run whole jobs call every API. The runner tolerates a failing source (ai_sections
+    # returns "" on any error), so a stage that never ran would otherwise just look fast.
+    missing = []
+    if {"run_job", "process_queue"} & set(names):
+        missing = [route for route in ("youtube", "serpapi", "openai") if not results["meta"]["standin_hits"].get(route)]
+    if missing:
+        results["meta"]["missing_standin_hits"] = missing
+
+    out = out or os.path.join(ROOT, "bench", "results",
+                              f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{results['meta']['git_sha']}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results["scenarios"], indent=2))
+    print(f"results written to {out}", file=sys.stderr)
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            print(compare(json.load(f), results))
+    if missing:
+        sys.exit(f"error: no requests reached the stand-in's {', '.join(missing)} endpoints; "
+                 "those stages failed, so the job timings leave them out")
+
+if __name__ == "__main__":
+    main()
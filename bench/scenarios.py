@@ -0,0 +1,123 @@
+import time, statistics
+from datetime import timedelta
+import database, models
+import utils, runner, worker
+from cache import FEED_CACHE
+from bench import synth
+
+def summarize(samples):
+    # Seconds in, milliseconds out.
+    ms = sorted(s * 1000.0 for s in samples)
+    return {"n": len(ms), "min_ms": round(ms[0], 3), "median_ms": round(statistics.median(ms), 3),
+            "mean_ms": round(statistics.fmean(ms), 3), "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+            "max_ms": round(ms[-1], 3)}
+
+def timed(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+def _job(db, ctx, name, entries, status="queued"):
+    job = models.CreatorJob(name=name, timeframe="2020–present", status=status,
+                            podcast_rss=ctx.standin.feed_url(f"{name}-podcast", entries),
+                            site_rss=ctx.standin.feed_url(f"{name}-site", entries, "atom"),
+                            yt_channel_url=f"https://www.youtube.com/channel/UC{name}")
+    db.add(job)
+    db.commit()
+    return job
+
+def analyze_text(ctx):
+    out = {}
+    for label, html in (("plain", False), ("html", True)):
+        texts = synth.texts(ctx.size(2000, 200), density=0.05, words=120, html=html)
+        samples = timed(lambda: utils.analyze_many(texts), ctx.repeat)
+        out[label] = {**summarize(samples), "texts": len(texts),
+                      "texts_per_sec": round(len(texts) / statistics.median(samples), 1)}
+    return out
+
+def parse_feed(ctx):
+    # Per-feed cost against the stand-in: the runner's latest-40 window and a full read with the cache
+    # disabled, then a stale cache entry revalidated with a conditional GET (304, no re-parse).
+    ttl = FEED_CACHE.ttl
+    out = {}
+    try:
+        FEED_CACHE.ttl = timedelta(0)
+        for entries in ctx.size((40, 1000, 5000), (40, 500)):
+            for fmt in ("rss", "atom"):
+                url = ctx.standin.feed_url(f"parse-{entries}", entries, fmt)
+                out[f"{fmt}_{entries}_limit40"] = summarize(timed(lambda: utils.parse_generic_rss(url, limit=40), ctx.repeat))
+                out[f"{fmt}_{entries}_full"] = summarize(timed(lambda: utils.parse_generic_rss(url, limit=entries), max(1, ctx.repeat // 2)))
+                # The entry cached by the timings above is always stale at ttl 0, so each call revalidates.
+                before = ctx.standin.not_modified
+                out[f"{fmt}_{entries}_revalidated"] = summarize(timed(lambda: utils.parse_generic_rss(url, limit=entries), ctx.repeat))
+                out[f"{fmt}_{entries}_revalidated"]["not_modified"] = ctx.standin.not_modified - before
+    finally:
+        FEED_CACHE.ttl = ttl
+    return out
+
+def run_job(ctx):
+    # End to end with every source and API enabled: first run (all items new) and a re-run (nothing changed).
+    db = database.SessionLocal()
+    try:
+        first, again = [], []
+        for i in range(ctx.size(10, 3)):
+            # Run directly, outside the queue, so process_queue does not pick these up.
+            job = _job(db, ctx, f"run{i}", ctx.size(200, 60), status="done")
+            t0 = time.perf_counter()
+            runner.run_job(db, job)
+            first.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            runner.run_job(db, job)
+            again.append(time.perf_counter() - t0)
+        return {"first_run": summarize(first), "rerun_unchanged": summarize(again)}
+    finally:
+        db.close()
+
+def process_queue(ctx):
+    db = database.SessionLocal()
+    try:
+        count = ctx.size(40, 8)
+        for i in range(count):
+            _job(db, ctx, f"queue{i}", ctx.size(100, 40))
+    finally:
+        db.close()
+    out = {}
+    t0 = time.perf_counter()
+    done = worker.process_queue(ctx.concurrency)
+    elapsed = time.perf_counter() - t0
+    out[f"concurrency_{ctx.concurrency}"] = {"jobs": len(done), "seconds": round(elapsed, 3),
+                                              "jobs_per_minute": round(len(done) * 60.0 / elapsed, 1)}
+    return out
+
+def endpoints(ctx):
+    from fastapi.testclient import TestClient
+    import main
+    client = TestClient(main.app)
+    db = database.SessionLocal()
+    try:
+        job_id = db.query(models.CollectedItem.job_id).group_by(models.CollectedItem.job_id) \
+            .order_by(models.CollectedItem.job_id.desc()).limit(1).scalar()
+    finally:
+        db.close()
+    if job_id is None:
+        return {"skipped": "no collected items; run the run_job or process_queue scenario first"}
+    paths = {"jobs": "/jobs", "jobs_summary": "/jobs/summary?limit=50",
+             "report": f"/reports/{job_id}", "report_all_fields": f"/reports/{job_id}?limit=1000&fields=" + ",".join(
+                 ["id", "date", "title", "description", "sensational_terms", "us_vs_them", "monetization"]),
+             "report_md": f"/reports/{job_id}/report.md", "report_html": f"/reports/{job_id}/report.html",
+             "report_json": f"/reports/{job_id}/report.json", "items_search": "/items/search?q=shocking&flags=us_vs_them"}
+    out = {}
+    for name, path in paths.items():
+        def get():
+            r = client.get(path)
+            r.raise_for_status()
+        out[name] = summarize(timed(get, ctx.size(50, 10)))
+    return out
+
+SCENARIOS = {"analyze_text": analyze_text, "parse_feed": parse_feed, "run_job": run_job,
+             "process_queue": process_queue, "endpoints": endpoints}
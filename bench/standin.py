@@ -0,0 +1,140 @@
+import hashlib, json, sys, threading, time, zlib
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from bench import synth
+
+class StandIn:
+    # Local HTTP server answering for every outbound call the app makes:
+    #   /feeds/<name>.xml?entries=N&format=rss|atom&density=&words=&html=0|1&seed=
+    #   /youtube/feeds/videos.xml?channel_id=...   (YOUTUBE_FEED_BASE)
+    #   /youtube/v3/channels                       (YOUTUBE_API_BASE)
+    #   /serpapi/search.json                       (SERPAPI_BASE)
+    #   /openai/v1/chat/completions                (OPENAI_BASE_URL)
+    # Every response waits `latency` seconds (per route prefix via `latencies`, or ?latency_ms=) first.
+    # Feeds carry an ETag and Last-Modified and answer a matching conditional GET with 304.
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, latencies=None):
+        self.latency = latency
+        self.latencies = dict(latencies or {})
+        self.hits, self.lock, self.feeds = {}, threading.Lock(), {}
+        self.not_modified = 0
+        self.started = formatdate(time.time(), usegmt=True)
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so the app's connection pooling is exercised
+
+            def do_GET(self):
+                standin._handle(self, "GET")
+
+            def do_POST(self):
+                standin._handle(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                # The app closes feeds it stopped reading early; that reset is expected, not an error.
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    super().handle_error(request, client_address)
+
+        self.server = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="standin", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def env(self):
+        # Settings that point the app at this server; they must be set before http_client is imported.
+        return {"YOUTUBE_API_BASE": f"{self.url}/youtube/v3", "YOUTUBE_FEED_BASE": f"{self.url}/youtube/feeds",
+                "SERPAPI_BASE": f"{self.url}/serpapi", "OPENAI_BASE_URL": f"{self.url}/openai/v1"}
+
+    def feed_url(self, name, entries=40, format="rss", **params):
+        query = "&".join(f"{k}={v}" for k, v in {"entries": entries, "format": format, **params}.items())
+        return f"{self.url}/feeds/{name}.xml?{query}"
+
+    def _delay(self, path, query):
+        if "latency_ms" in query:
+            return float(query["latency_ms"][0]) / 1000.0
+        for prefix, seconds in self.latencies.items():
+            if path.startswith(prefix):
+                return seconds
+        return self.latency
+
+    def _handle(self, handler, method):
+        parts = urlsplit(handler.path)
+        path, query = parts.path, parse_qs(parts.query)
+        if method == "POST":
+            handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+        route = path.split("/")[1] if path.count("/") > 1 else path
+        with self.lock:
+            self.hits[route] = self.hits.get(route, 0) + 1
+        delay = self._delay(path, query)
+        if delay:
+            time.sleep(delay)
+        try:
+            status, ctype, body = self._route(method, path, query)
+        except (KeyError, ValueError) as e:
+            status, ctype, body = 400, "text/plain", str(e).encode()
+        headers = {}
+        if status == 200 and "xml" in ctype:
+            # Generated feeds never change, so a hash of the body and the start time are valid validators.
+            headers = {"ETag": '"%s"' % hashlib.sha1(body).hexdigest()[:16], "Last-Modified": self.started}
+            if handler.headers.get("If-None-Match") == headers["ETag"] or \
+                    (handler.headers.get("If-None-Match") is None and handler.headers.get("If-Modified-Since") == self.started):
+                status, body = 304, b""
+                with self.lock:
+                    self.not_modified += 1
+        handler.send_response(status)
+        handler.send_header("Content-Type", ctype)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _feed(self, key, build):
+        # Feeds are generated once per distinct query and then served from memory.
+        with self.lock:
+            if key not in self.feeds:
+                self.feeds[key] = build()
+            return self.feeds[key]
+
+    def _route(self, method, path, query):
+        q = {k: v[0] for k, v in query.items()}
+        if path.startswith("/feeds/"):
+            entries, fmt = int(q.get("entries", 40)), q.get("format", "rss")
+            kwargs = {"density": float(q.get("density", 0.05)), "words": int(q.get("words", 120)),
+                      "html": q.get("html", "1") == "1", "seed": int(q.get("seed", zlib.crc32(path.encode()) % 10**6))}
+            key = (path, tuple(sorted(q.items())))
+            build = synth.atom if fmt == "atom" else synth.rss
+            body = self._feed(key, lambda: build(entries, **kwargs))
+            ctype = "application/atom+xml" if fmt == "atom" else "application/rss+xml"
+            return 200, ctype, body
+        if path == "/youtube/feeds/videos.xml":
+            seed = zlib.crc32(q.get("channel_id", "").encode()) % 10**6
+            body = self._feed(("yt", seed), lambda: synth.atom(15, youtube=True, seed=seed, words=60))
+            return 200, "application/atom+xml", body
+        if path == "/youtube/v3/channels":
+            stats = {"subscriberCount": "1250000", "viewCount": "987654321", "videoCount": "842"}
+            return 200, "application/json", json.dumps({"items": [{"id": q.get("id", ""), "statistics": stats}]}).encode()
+        if path == "/serpapi/search.json":
+            results = [{"title": f"{q.get('q', '')} result {i}", "link": f"https://news.example.com/{zlib.crc32(q.get('q', '').encode())}/{i}"}
+                       for i in range(int(q.get("num", 5)))]
+            return 200, "application/json", json.dumps({"organic_results": results}).encode()
+        if path == "/openai/v1/chat/completions" and method == "POST":
+            content = "\n\n".join(f"{s}\n- Synthetic section text." for s in
+                                  ["Overview", "Content Themes & Direction", "Language & Tone", "Conclusion & Takeaway for Parents"])
+            return 200, "application/json", json.dumps({
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1000, "completion_tokens": 200, "total_tokens": 1200}}).encode()
+        return 404, "text/plain", b"not found"
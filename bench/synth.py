@@ -0,0 +1,70 @@
+import random
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+# Words the analyzers look for, drawn in at `density`; the filler never matches anything.
+CUES = ["shocking", "bombshell", "exposed", "they", "the elites", "mainstream media", "experts say", "obviously",
+        "outrage", "heartbreaking", "everyone is", "sponsored by", "use code", "patreon", "merch", "PragerU",
+        "Daily Wire", "libertarian", "progressive", "populist", "clown", "traitor"]
+FILLER = ["episode", "guest", "talk", "about", "week", "news", "story", "listener", "question", "today", "culture",
+          "music", "book", "game", "interview", "notes", "update", "review", "local", "history"]
+
+def _sentence(rng, words, density):
+    return " ".join(rng.choice(CUES) if rng.random() < density else rng.choice(FILLER) for _ in range(words))
+
+def _description(rng, words, density, html):
+    if not html:
+        return _sentence(rng, words, density)
+    # Show-notes style markup: paragraphs, links and lists around the same text.
+    parts, left = [], words
+    while left > 0:
+        n = min(left, rng.randint(12, 40))
+        left -= n
+        kind = rng.random()
+        if kind < 0.6:
+            parts.append(f"<p>{_sentence(rng, n, density)} <a href=\"https://example.com/{rng.randint(1, 10**6)}\">link</a></p>")
+        elif kind < 0.85:
+            parts.append("<ul>" + "".join(f"<li><strong>{_sentence(rng, 3, density)}</strong> {_sentence(rng, max(1, n // 4), density)}</li>"
+                                          for _ in range(4)) + "</ul>")
+        else:
+            parts.append(f"<div class=\"notes\"><em>{_sentence(rng, n, density)}</em><br/><img src=\"https://example.com/i.png\"/></div>")
+    return "".join(parts)
+
+def entries(count, density=0.05, words=120, html=True, seed=1, start=None, step_days=3):
+    # Newest first, like real feeds, `step_days` apart.
+    rng = random.Random(seed)
+    start = start or datetime(2025, 6, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        yield {"id": f"synthetic-{seed}-{i}", "title": _sentence(rng, 8, density * 2).capitalize(),
+               "link": f"https://example.com/{seed}/{i}", "date": start - timedelta(days=step_days * i),
+               "description": _description(rng, words, density, html)}
+
+def rss(count, next_url=None, **kwargs):
+    items = "".join(
+        f"<item><title>{escape(e['title'])}</title><link>{e['link']}</link><guid>{e['id']}</guid>"
+        f"<pubDate>{e['date'].strftime('%a, %d %b %Y %H:%M:%S GMT')}</pubDate>"
+        f"<description>{escape(e['description'])}</description></item>"
+        for e in entries(count, **kwargs))
+    nxt = f'<atom:link rel="next" href="{escape(next_url)}"/>' if next_url else ""
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">'
+            f"<channel><title>Synthetic feed</title><link>https://example.com/</link>{nxt}{items}</channel></rss>").encode()
+
+def atom(count, next_url=None, youtube=False, **kwargs):
+    # youtube=True mimics a channel feed: the description lives in media:group.
+    def body(e):
+        desc = escape(e["description"])
+        if youtube:
+            return f'<media:group><media:title>{escape(e["title"])}</media:title><media:description>{desc}</media:description></media:group>'
+        return f'<summary type="html">{desc}</summary>'
+    items = "".join(
+        f"<entry><id>{e['id']}</id><title>{escape(e['title'])}</title><link rel=\"alternate\" href=\"{e['link']}\"/>"
+        f"<published>{e['date'].isoformat()}</published><updated>{e['date'].isoformat()}</updated>{body(e)}</entry>"
+        for e in entries(count, **kwargs))
+    nxt = f'<link rel="next" href="{escape(next_url)}"/>' if next_url else ""
+    return ('<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom" '
+            'xmlns:media="http://search.yahoo.com/mrss/">'
+            f"<title>Synthetic feed</title>{nxt}{items}</feed>").encode()
+
+def texts(count, density=0.05, words=120, html=False, seed=1):
+    # Title + description strings as runner hands them to analyze_many.
+    return [e["title"] + " " + e["description"] for e in entries(count, density, words, html, seed)]
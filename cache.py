@@ -0,0 +1,163 @@
+import os, json, hashlib, logging, threading
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal
+import models
+
+log = logging.getLogger(__name__)
+
+def _evict_lru(db, model, max_entries, max_bytes):
+    count, size = db.query(func.count(model.id), func.coalesce(func.sum(model.size_bytes), 0)).one()
+    if count <= max_entries and size <= max_bytes:
+        return
+    # Least recently used first until both bounds hold again.
+    doomed = []
+    for eid, nbytes in db.query(model.id, model.size_bytes).order_by(model.accessed_at.asc()):
+        if count <= max_entries and size <= max_bytes:
+            break
+        doomed.append(eid); count -= 1; size -= nbytes or 0
+    db.commit()
+    db.query(model).filter(model.id.in_(doomed)).delete(synchronize_session=False)
+    db.commit()
+    log.info("%s evicted %d entries", model.__tablename__, len(doomed))
+
+class FeedCache:
+    # Parsed feed items per URL with the validators needed for a conditional GET. Within `ttl` a feed
+    # is served without touching the network; after that it is revalidated and a 304 reuses the parse.
+    def __init__(self, ttl=None, max_entries=None, max_bytes=None):
+        self.ttl = timedelta(seconds=ttl if ttl is not None else int(os.getenv("FEED_CACHE_TTL", "900")))
+        self.max_entries = max_entries or int(os.getenv("FEED_CACHE_MAX_ENTRIES", "1000"))
+        self.max_bytes = max_bytes or int(os.getenv("FEED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    def get(self, url, limit):
+        db = SessionLocal()
+        try:
+            e = db.query(models.FeedCacheEntry).filter_by(url=url).first()
+            if not e:
+                return None
+            items = json.loads(e.items_json or "[]")
+            # An entry parsed with a smaller limit cannot answer a bigger request unless the feed was shorter.
+            if e.item_limit < limit and len(items) >= e.item_limit:
+                return None
+            headers = {}
+            if e.etag: headers["If-None-Match"] = e.etag
+            if e.last_modified: headers["If-Modified-Since"] = e.last_modified
+            now = datetime.utcnow()
+            fresh = now - e.fetched_at < self.ttl
+            # Every usable hit counts as a use, so eviction is least recently used, not oldest fetched.
+            db.query(models.FeedCacheEntry).filter_by(id=e.id).update({"accessed_at": now}, synchronize_session=False)
+            db.commit()
+            return {"items": items[:limit], "headers": headers, "fresh": fresh}
+        finally:
+            db.close()
+
+    def touch(self, url, revalidated=False):
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            values = {"accessed_at": now, "fetched_at": now} if revalidated else {"accessed_at": now}
+            db.query(models.FeedCacheEntry).filter_by(url=url).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def put(self, url, items, limit, etag="", last_modified=""):
+        body = json.dumps(items)
+        now = datetime.utcnow()
+        values = {"etag": etag or "", "last_modified": last_modified or "", "items_json": body, "item_limit": limit,
+                  "size_bytes": len(body), "fetched_at": now, "accessed_at": now}
+        db = SessionLocal()
+        try:
+            if not db.query(models.FeedCacheEntry).filter_by(url=url).update(values, synchronize_session=False):
+                db.add(models.FeedCacheEntry(url=url, **values))
+            db.commit()
+            _evict_lru(db, models.FeedCacheEntry, self.max_entries, self.max_bytes)
+        except IntegrityError:
+            db.rollback()  # another worker cached the same feed concurrently
+        finally:
+            db.close()
+
+class ResultCache:
+    # Results of paid API calls keyed by a hash of the exact request payload, so an unchanged job
+    # re-run makes no outbound calls. RESULT_CACHE_BYPASS=1 (or bypass=True) skips reads but still stores.
+    def __init__(self, max_entries=None, max_bytes=None, bypass=None):
+        self.max_entries = max_entries or int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "20000"))
+        self.max_bytes = max_bytes or int(os.getenv("RESULT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+        self.bypass = bypass if bypass is not None else os.getenv("RESULT_CACHE_BYPASS", "") in ("1", "true", "yes")
+
+    @staticmethod
+    def key(namespace, payload):
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(f"{namespace}\n{body}".encode("utf-8")).hexdigest()
+
+    def get(self, namespace, payload, bypass=False):
+        # Returns (hit, value) so cached falsy values are distinguishable from misses.
+        if bypass or self.bypass:
+            return False, None
+        db = SessionLocal()
+        try:
+            E = models.ApiCacheEntry
+            now = datetime.utcnow()
+            e = db.query(E).filter_by(key=self.key(namespace, payload)).first()
+            if not e or (e.expires_at and e.expires_at <= now):
+                return False, None
+            value = json.loads(e.value_json)
+            db.commit()
+            db.query(E).filter_by(id=e.id).update({"accessed_at": now}, synchronize_session=False)
+            db.commit()
+            return True, value
+        finally:
+            db.close()
+
+    def put(self, namespace, payload, value, ttl):
+        body = json.dumps(value)
+        now = datetime.utcnow()
+        values = {"namespace": namespace, "value_json": body, "size_bytes": len(body), "created_at": now,
+                  "accessed_at": now, "expires_at": now + timedelta(seconds=ttl) if ttl else None}
+        key = self.key(namespace, payload)
+        db = SessionLocal()
+        try:
+            E = models.ApiCacheEntry
+            if not db.query(E).filter_by(key=key).update(values, synchronize_session=False):
+                db.add(E(key=key, **values))
+            db.query(E).filter(E.expires_at <= now).delete(synchronize_session=False)
+            db.commit()
+            _evict_lru(db, E, self.max_entries, self.max_bytes)
+        except IntegrityError:
+            db.rollback()
+        finally:
+            db.close()
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first caller runs fn and everyone
+    # who arrives while it is in flight gets its result (or its exception) instead of repeating it.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call["done"].set()
+
+FEED_CACHE = FeedCache()
+RESULT_CACHE = ResultCache()
+FEED_FLIGHTS = SingleFlight()
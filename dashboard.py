@@ -28,19 +28,34 @@ with st.form("new_job"):
         else:
             st.error(r.text)
 
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_report(api_url, job_id, updated_at):
+    # updated_at is part of the cache key, so a report is refetched only after its job changed.
+    rr = requests.get(f"{api_url}/reports/{job_id}", params={"limit": 20})
+    return rr.json() if rr.status_code == 200 else None
+
 st.header("Jobs")
-r = requests.get(f"{api_url}/jobs")
+page_size = st.number_input("Jobs per page", min_value=10, max_value=500, value=50, step=10)
+cursors = st.session_state.setdefault("job_cursors", [None])
+r = requests.get(f"{api_url}/jobs/summary", params={"limit": page_size, **({"before": cursors[-1]} if cursors[-1] else {})})
 if r.status_code == 200:
-    jobs = r.json()
-    for j in jobs:
-        with st.expander(f"Job {j['id']} — {j['name']} — {j['status']}", expanded=False):
-            st.write(j)
-            rr = requests.get(f"{api_url}/reports/{j['id']}")
-            if rr.status_code == 200:
-                data = rr.json()
-                st.subheader("Report Markdown")
-                st.code(data.get("report_markdown","") or "(Report not generated yet)")
-                st.subheader("Items (first 20)")
-                st.write(data["items"][:20])
+    page = r.json()
+    for j in page["jobs"]:
+        with st.expander(f"Job {j['id']} — {j['name']} — {j['status']} — {j['item_count']} items", expanded=False):
+            st.write({k: j[k] for k in ("timeframe", "error_message", "updated_at", "sensational_rate",
+                                        "us_them_rate", "explicit_rate", "monetized_rate")})
+            st.code(j["report_excerpt"] or "(Report not generated yet)")
+            if st.checkbox("Load full report", key=f"full_{j['id']}"):
+                data = load_report(api_url, j["id"], j["updated_at"])
+                if data:
+                    st.subheader("Report Markdown")
+                    st.code(data.get("report_markdown","") or "(Report not generated yet)")
+                    st.subheader("Items (first 20)")
+                    st.write(data["items"])
+    col1, col2 = st.columns(2)
+    if len(cursors) > 1 and col1.button("Newer jobs"):
+        cursors.pop(); st.rerun()
+    if page["next_before"] and col2.button("Older jobs"):
+        cursors.append(page["next_before"]); st.rerun()
 else:
     st.error("Cannot fetch jobs")
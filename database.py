@@ -1,5 +1,72 @@
-from sqlalchemy import create_engine
+import os, logging
+from sqlalchemy import create_engine, event, inspect, insert, update, literal, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, declarative_base
-engine = create_engine("sqlite:///./app.db", connect_args={"check_same_thread": False})
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db").replace("postgres://", "postgresql://", 1)
+# Sized for the uvicorn threadpool (40 threads by default) plus the job workers and their ingest threads.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "30"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+
+def make_engine(url=DATABASE_URL):
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+                             pool_pre_ping=True, pool_recycle=1800)
+    memory = url in ("sqlite://", "sqlite:///:memory:")
+    pool_args = {} if memory else {"pool_size": POOL_SIZE, "max_overflow": MAX_OVERFLOW, "pool_timeout": POOL_TIMEOUT}
+    eng = create_engine(url, connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}, **pool_args)
+
+    @event.listens_for(eng, "connect")
+    def _sqlite_pragmas(dbapi_conn, _):
+        # WAL lets API readers proceed while a job is writing; NORMAL sync is durable enough under WAL.
+        cur = dbapi_conn.cursor()
+        if not memory:
+            cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+    return eng
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+log = logging.getLogger(__name__)
+
+BULK_CHUNK = 1000
+
+def bulk_insert(db, model, rows, chunk=BULK_CHUNK):
+    # Core executemany in chunks; skips ORM object construction and per-row flushes.
+    for i in range(0, len(rows), chunk):
+        db.execute(insert(model), rows[i:i + chunk])
+
+def bulk_update(db, model, rows, chunk=BULK_CHUNK):
+    # rows must carry the primary key; executed as one executemany UPDATE per chunk.
+    for i in range(0, len(rows), chunk):
+        db.execute(update(model), rows[i:i + chunk])
+
+def migrate(bind=None):
+    # create_all only creates missing tables; add columns introduced since an app.db was created.
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in have:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(dialect=bind.dialect)}"
+                if col.default is not None and col.default.is_scalar:
+                    ddl += " DEFAULT " + str(literal(col.default.arg, col.type).compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+                conn.execute(text(ddl))
+    for table in Base.metadata.sorted_tables:
+        have = {ix["name"] for ix in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in have:
+                continue
+            try:
+                index.create(bind=bind)
+            except IntegrityError as e:
+                log.warning("could not create %s, existing rows violate it: %s", index.name, e)
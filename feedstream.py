@@ -0,0 +1,111 @@
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+ENTRY_TAGS = {"item", "{http://purl.org/rss/1.0/}item", ATOM + "entry"}
+# Feeds are newest-first but not always strictly; tolerate a few out-of-range entries before stopping.
+OUT_OF_RANGE_TOLERANCE = 5
+
+ParseError = ET.ParseError
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+def _text(elem):
+    return "".join(elem.itertext()).strip()
+
+def _entry(elem):
+    # Same keys feedparser exposes on an entry, so both parsers feed one normaliser.
+    e = {"title": "", "link": "", "id": "", "published": "", "updated": "", "summary": ""}
+    content = ""
+    for child in elem:
+        name = _local(child.tag)
+        if name == "title":
+            e["title"] = _text(child)
+        elif name == "link":
+            href = child.get("href")
+            if href is None:
+                e["link"] = e["link"] or _text(child)
+            elif child.get("rel", "alternate") == "alternate" and not e["link"]:
+                e["link"] = href
+        elif name in ("guid", "id"):
+            e["id"] = e["id"] or _text(child)
+        elif name in ("pubDate", "published", "date", "issued"):
+            e["published"] = e["published"] or _text(child)
+        elif name in ("updated", "modified"):
+            e["updated"] = e["updated"] or _text(child)
+        elif name in ("description", "summary"):
+            e["summary"] = e["summary"] or _text(child)
+        elif name in ("encoded", "content"):
+            content = content or _text(child)
+        elif name == "group":  # media:group, e.g. YouTube's media:description
+            for sub in child:
+                if _local(sub.tag) == "description" and not e["summary"]:
+                    e["summary"] = _text(sub)
+    e["summary"] = e["summary"] or content
+    return e
+
+def entry_date(e):
+    value = e.get("published") or e.get("updated") or ""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).date()
+    except (TypeError, ValueError, IndexError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    except ValueError:
+        pass
+    try:
+        from dateutil import parser as dateparser
+        return dateparser.parse(value).date()
+    except (ValueError, OverflowError):
+        return None
+
+def iter_entries(chunks, limit=None, since=None, until=None, feed=None):
+    # Incremental RSS/Atom parse over an iterable of byte chunks. Each entry is turned into a dict and
+    # its element discarded as soon as it closes, and reading stops once `limit` entries are yielded
+    # or entries fall before `since`, so memory tracks the entries kept rather than the document.
+    # Entries dated after `until` are skipped. If given, `feed` receives the feed-level rel links
+    # (e.g. RFC 5005 "next") under "links" and "complete": False when reading stopped early.
+    # Raises ParseError on malformed XML; callers fall back to feedparser's lenient parser.
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack, count, older = [], 0, 0
+    feed = {} if feed is None else feed
+    links = feed.setdefault("links", {})
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag not in ENTRY_TAGS:
+                if _local(elem.tag) == "link" and stack and _local(stack[-1].tag) in ("feed", "channel"):
+                    if elem.get("rel") and elem.get("href"):
+                        links.setdefault(elem.get("rel"), elem.get("href"))
+                continue
+            e = _entry(elem)
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+            if since is not None or until is not None:
+                d = entry_date(e)
+                if d is not None and until is not None and d > until:
+                    continue
+                if d is not None and since is not None and d < since:
+                    older += 1
+                    if older >= OUT_OF_RANGE_TOLERANCE:
+                        feed["complete"] = False
+                        return
+                    continue
+                older = 0
+            yield e
+            count += 1
+            if limit and count >= limit:
+                feed["complete"] = False
+                return
+    parser.close()
+    feed["complete"] = True
@@ -0,0 +1,152 @@
+import os, time, random, threading, logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import observe
+
+log = logging.getLogger(__name__)
+
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "100"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+YOUTUBE_API_BASE = os.getenv("YOUTUBE_API_BASE", "https://www.googleapis.com/youtube/v3")
+SERPAPI_BASE = os.getenv("SERPAPI_BASE", "https://serpapi.com")
+YOUTUBE_FEED_BASE = os.getenv("YOUTUBE_FEED_BASE", "https://www.youtube.com/feeds")
+
+# provider -> (requests per second, burst); override with e.g. HTTP_RATE_SERPAPI="0.5/2".
+# Feed hosts get one bucket each ("feed:<host>") with the "feed" limits.
+RATE_LIMITS = {"youtube": (5.0, 10), "serpapi": (1.0, 2), "openai": (2.0, 4), "feed": (5.0, 10)}
+
+def _rate_limit(provider):
+    base = provider.split(":", 1)[0]
+    env = os.getenv(f"HTTP_RATE_{base.upper()}", "")
+    if env:
+        rate, _, burst = env.partition("/")
+        return float(rate), int(burst or 1)
+    return RATE_LIMITS.get(base, (10.0, 20))
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate, self.capacity = rate, burst
+        self.tokens, self.stamp = float(burst), time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def _retry_after(resp):
+    value = resp.headers.get("Retry-After", "") if resp is not None else ""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+class HttpClient:
+    # One keep-alive session for every outbound call: urllib3 keeps a connection pool per host,
+    # each provider is throttled by a token bucket, and 429/5xx/connection errors are retried with
+    # jittered exponential backoff that honours Retry-After.
+    def __init__(self):
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.buckets, self.counters = {}, {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, provider):
+        with self.lock:
+            if provider not in self.buckets:
+                self.buckets[provider] = TokenBucket(*_rate_limit(provider))
+            return self.buckets[provider]
+
+    def count(self, provider, key, n=1):
+        with self.lock:
+            c = self.counters.setdefault(provider.split(":", 1)[0], {"requests": 0, "retries": 0, "errors": 0, "throttled": 0})
+            c[key] += n
+
+    def throttle(self, provider):
+        self._bucket(provider).acquire()
+
+    def request(self, provider, method, url, timeout=30, retries=MAX_RETRIES, **kwargs):
+        for attempt in range(retries + 1):
+            self.throttle(provider)
+            self.count(provider, "requests")
+            resp, error = None, None
+            t0 = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, timeout=timeout, **kwargs)
+                # Streamed bodies are not read here; their consumer records the bytes it actually reads.
+                observe("api", time.perf_counter() - t0, provider,
+                        nbytes=0 if kwargs.get("stream") else len(resp.content))
+                if resp.status_code not in RETRY_STATUSES:
+                    return resp
+                if resp.status_code == 429:
+                    self.count(provider, "throttled")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                observe("api", time.perf_counter() - t0, provider)
+                error = e
+            if attempt == retries:
+                self.count(provider, "errors")
+                if error:
+                    raise error
+                return resp
+            delay = _retry_after(resp)
+            if delay is None:
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            self.count(provider, "retries")
+            if resp is not None:
+                resp.close()
+            log.info("%s %s: retrying in %.2fs (%s)", provider, url.split("?")[0],
+                     delay, error or resp.status_code)
+            time.sleep(min(delay, BACKOFF_MAX))
+
+    def get(self, provider, url, **kwargs):
+        return self.request(provider, "GET", url, **kwargs)
+
+    def stats(self):
+        # Per-host connection reuse from urllib3: every request beyond num_connections reused a socket.
+        hosts = {}
+        for key in list(self.adapter.poolmanager.pools.keys()):
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            port = f":{key.key_port}" if key.key_port else ""
+            hosts[f"{key.key_scheme}://{key.key_host}{port}"] = {
+                "connections": pool.num_connections, "requests": pool.num_requests,
+                "reused": max(0, pool.num_requests - pool.num_connections)}
+        with self.lock:
+            providers = {k: dict(v) for k, v in self.counters.items()}
+        return {"hosts": hosts, "providers": providers}
+
+HTTP = HttpClient()
+
+_openai_clients = {}
+_openai_lock = threading.Lock()
+
+def openai_client(api_key):
+    # The SDK client owns an httpx pool; build it once per key instead of per call. Its built-in
+    # retries already back off on 429/5xx and honour Retry-After.
+    with _openai_lock:
+        if api_key not in _openai_clients:
+            from openai import OpenAI
+            _openai_clients[api_key] = OpenAI(api_key=api_key, max_retries=MAX_RETRIES)
+        return _openai_clients[api_key]
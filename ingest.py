@@ -0,0 +1,57 @@
+import os, time, logging, contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from metrics import stage
+
+log = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv("INGEST_MAX_CONNECTIONS", "8"))
+FEED_TIMEOUT = float(os.getenv("INGEST_FEED_TIMEOUT", "30"))
+API_TIMEOUT = float(os.getenv("INGEST_API_TIMEOUT", "45"))
+
+class SourceTimeout(Exception):
+    pass
+
+def gather(tasks, max_workers=None):
+    # tasks: [(name, fn, timeout_seconds)]; every task runs at once up to max_workers.
+    # A task's timeout starts when it actually begins running, so a small pool does not eat into it.
+    # Returns (results, errors) keyed by name; a failing or slow source never affects the others.
+    results, errors, started = {}, {}, {}
+    if not tasks:
+        return results, errors
+
+    def _run(name, fn):
+        started[name] = time.monotonic()
+        with stage("fetch", source=name) as counts:
+            result = fn()
+            counts["items"] = len(result) if isinstance(result, (list, dict)) else 0
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers or MAX_CONNECTIONS, len(tasks))),
+                              thread_name_prefix="ingest")
+    # Each task runs in a copy of the caller's context so its timings reach the job being run.
+    futures = {pool.submit(contextvars.copy_context().run, _run, name, fn): (name, timeout) for name, fn, timeout in tasks}
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[futures[f][0]] + futures[f][1] - now for f in pending if futures[f][0] in started]
+            tick = max(0.0, min(deadlines + [0.5]))
+            done, pending = wait(pending, timeout=tick, return_when=FIRST_COMPLETED)
+            for f in done:
+                name = futures[f][0]
+                try:
+                    results[name] = f.result()
+                except Exception as e:
+                    log.warning("source %s failed: %s", name, e)
+                    errors[name] = e
+            now = time.monotonic()
+            for f in list(pending):
+                name, timeout = futures[f]
+                if name in started and now - started[name] > timeout:
+                    pending.discard(f)
+                    errors[name] = SourceTimeout(f"timed out after {timeout:g}s")
+                    log.warning("source %s timed out after %gs", name, timeout)
+    finally:
+        # Abandoned sources finish in the background; their own HTTP timeouts bound them.
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results, errors
@@ -0,0 +1,242 @@
+import os, socket, threading, uuid, random, logging
+from collections import Counter
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from sqlalchemy import update, or_, and_, func, case
+from database import SessionLocal
+import models
+from http_client import YOUTUBE_API_BASE, YOUTUBE_FEED_BASE, SERPAPI_BASE
+from metrics import job_run, observe, stage, save as save_timings
+
+log = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "30"))
+# A standalone worker cannot be woken by the API process, so it checks the queue more often.
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1"))
+DOMAIN_CONCURRENCY = int(os.getenv("QUEUE_DOMAIN_CONCURRENCY", "2"))
+# Hosts nearly every job calls (YouTube and the API providers) are paced per request by the http_client
+# buckets; counting them here would cap the whole fleet at DOMAIN_CONCURRENCY jobs.
+SHARED_HOSTS = {urlparse(u).netloc.lower() for u in (YOUTUBE_API_BASE, YOUTUBE_FEED_BASE, SERPAPI_BASE)} | \
+    {"youtube.com", "www.youtube.com", "m.youtube.com"}
+
+Job = models.CreatorJob
+
+def _claimable(now):
+    # Queued jobs whose backoff has elapsed, plus running jobs whose worker stopped renewing the lease.
+    return or_(
+        and_(Job.status == "queued", or_(Job.next_attempt_at.is_(None), Job.next_attempt_at <= now)),
+        and_(Job.status == "running", Job.attempts < MAX_ATTEMPTS,
+             or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)),
+    )
+
+def reap(db):
+    # Running jobs that crashed on their last allowed attempt are not reclaimed; fail them instead.
+    now = datetime.utcnow()
+    db.execute(update(Job).where(Job.status == "running", Job.attempts >= MAX_ATTEMPTS,
+                                 or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now))
+               .values(status="error", worker_id="", lease_expires_at=None,
+                       error_message="lease expired on final attempt"),
+               execution_options={"synchronize_session": False})
+    db.commit()
+
+def job_domains(row):
+    # The podcast and site feed hosts a job fetches from; those are what the per-domain limit protects.
+    return {urlparse(u).netloc.lower() for u in (row.podcast_rss, row.site_rss) if u} - SHARED_HOSTS
+
+def next_due(db):
+    # Earliest retry that is still backing off, so the dispatcher can wake exactly then.
+    return db.query(func.min(Job.next_attempt_at)).filter(Job.status == "queued",
+                                                          Job.next_attempt_at > datetime.utcnow()).scalar()
+
+def _after(row):
+    # Keyset position in claim order (priority desc, created_at asc, id asc): rows strictly after row.
+    return or_(Job.priority < row.priority,
+               and_(Job.priority == row.priority,
+                    or_(Job.created_at > row.created_at, and_(Job.created_at == row.created_at, Job.id > row.id))))
+
+def claim(db, worker_id, limit=1, domain_limit=DOMAIN_CONCURRENCY):
+    # Highest priority first, then oldest. A job is skipped while any feed host it fetches from already has
+    # domain_limit jobs running (across all workers), so a burst against one podcast host is spread out.
+    # Skipped jobs do not block the queue: candidates are read a page at a time until enough are claimed.
+    now = datetime.utcnow()
+    urls = (Job.podcast_rss, Job.site_rss)
+    busy = Counter()
+    for row in db.query(*urls).filter(Job.status == "running", Job.lease_expires_at >= now):
+        busy.update(job_domains(row))
+    claimed, last, page = [], None, limit * 4 + 50
+    while len(claimed) < limit:
+        q = db.query(Job.id, Job.priority, Job.created_at, *urls).filter(_claimable(now))
+        if last is not None:
+            q = q.filter(_after(last))
+        candidates = q.order_by(Job.priority.desc(), Job.created_at.asc(), Job.id.asc()).limit(page).all()
+        db.commit()  # end the read snapshot; under SQLite WAL a stale reader cannot upgrade to a writer
+        for row in candidates:
+            if len(claimed) >= limit:
+                break
+            jid, domains = row.id, job_domains(row)
+            if any(busy[d] >= domain_limit for d in domains):
+                continue
+            # Compare-and-set: the row only moves if it is still claimable, so concurrent claimers cannot both win.
+            # A reclaimed job's queue wait starts when its lease expired, as a retry's starts when it is due.
+            res = db.execute(update(Job).where(Job.id == jid, _claimable(now))
+                             .values(status="running", worker_id=worker_id, attempts=Job.attempts + 1,
+                                     lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                                     enqueued_at=case((Job.status == "running", func.coalesce(Job.lease_expires_at, now)),
+                                                      else_=Job.enqueued_at)),
+                             execution_options={"synchronize_session": False})
+            db.commit()
+            if res.rowcount == 1:
+                claimed.append(jid)
+                busy.update(domains)
+        if len(candidates) < page:
+            break
+        last = candidates[-1]
+    return claimed
+
+def renew(db, worker_id, job_ids):
+    if not job_ids:
+        return
+    db.execute(update(Job).where(Job.id.in_(job_ids), Job.worker_id == worker_id, Job.status == "running")
+               .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)),
+               execution_options={"synchronize_session": False})
+    db.commit()
+
+def complete(db, job, worker_id, warnings=()):
+    res = db.execute(update(Job).where(Job.id == job.id, Job.worker_id == worker_id, Job.status == "running")
+                     .values(status="done", error_message="; ".join(warnings), worker_id="",
+                             lease_expires_at=None, next_attempt_at=None),
+                     execution_options={"synchronize_session": False})
+    db.commit()
+    return res.rowcount == 1
+
+def fail(db, job, worker_id, error):
+    attempts = job.attempts or 1
+    values = {"error_message": str(error), "worker_id": "", "lease_expires_at": None}
+    if attempts >= MAX_ATTEMPTS:
+        values.update(status="error", next_attempt_at=None)
+    else:
+        delay = RETRY_BACKOFF * 2 ** (attempts - 1) * random.uniform(0.5, 1.5)
+        due = datetime.utcnow() + timedelta(seconds=delay)
+        values.update(status="queued", next_attempt_at=due, enqueued_at=due)
+    db.execute(update(Job).where(Job.id == job.id, Job.worker_id == worker_id, Job.status == "running")
+               .values(**values), execution_options={"synchronize_session": False})
+    db.commit()
+
+class WorkerPool:
+    def __init__(self, concurrency=CONCURRENCY, worker_id=None, poll_seconds=POLL_SECONDS):
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+        self.active = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()  # no more claims
+        self.released = threading.Event()  # running jobs are finished; stop renewing their leases
+        self.wake = threading.Event()
+        self.due = None
+        threading.Thread(target=self._heartbeat, name="job-lease", daemon=True).start()
+
+    def start(self):
+        threading.Thread(target=self._dispatch_loop, name="job-dispatch", daemon=True).start()
+        return self
+
+    def notify(self):
+        # Called on submit (and when a slot frees up) so work starts immediately instead of at the next poll.
+        self.wake.set()
+
+    def _dispatch_loop(self):
+        while not self.stopped.is_set():
+            self.wake.clear()
+            try:
+                self.dispatch()
+            except Exception:
+                log.exception("dispatch failed")
+            timeout = self.poll_seconds
+            if self.due:
+                timeout = min(timeout, max(0.0, (self.due - datetime.utcnow()).total_seconds()) + 0.05)
+            self.wake.wait(timeout)
+
+    def dispatch(self):
+        # Claim as many jobs as there are free slots and start them; returns the claimed ids.
+        with self.lock:
+            free = self.concurrency - len(self.active)
+            if free <= 0 or self.stopped.is_set():
+                return []
+            db = SessionLocal()
+            try:
+                reap(db)
+                ids = claim(db, self.worker_id, free)
+                self.due = next_due(db)
+            finally:
+                db.close()
+            for jid in ids:
+                self.active[jid] = self.executor.submit(self._run, jid)
+            return ids
+
+    def drain(self):
+        processed = []
+        while True:
+            processed += self.dispatch()
+            with self.lock:
+                running = list(self.active.values())
+            if not running:
+                return processed
+            running[0].result()
+
+    def _run(self, job_id):
+        from runner import run_job
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            with job_run(job_id) as timings:
+                queued_at = job.enqueued_at or job.created_at
+                observe("queue_wait", max(0.0, (datetime.utcnow() - queued_at).total_seconds()))
+                try:
+                    with stage("job"):
+                        warnings = run_job(db, job) or []
+                    complete(db, job, self.worker_id, warnings)
+                except Exception as e:
+                    log.exception("job %s failed", job_id)
+                    db.rollback()
+                    fail(db, job, self.worker_id, e)
+            try:
+                save_timings(db, timings)
+            except Exception:
+                log.exception("could not store timings for job %s", job_id)
+                db.rollback()
+        finally:
+            db.close()
+            with self.lock:
+                self.active.pop(job_id, None)
+            self.wake.set()
+
+    def _heartbeat(self):
+        while not self.released.wait(LEASE_SECONDS / 3):
+            with self.lock:
+                ids = list(self.active)
+            if not ids:
+                continue
+            db = SessionLocal()
+            try:
+                renew(db, self.worker_id, ids)
+            except Exception:
+                log.exception("lease renewal failed")
+            finally:
+                db.close()
+
+    def shutdown(self, wait=True):
+        # Stop claiming first (under the lock, so no dispatch is between claim and submit), then let running
+        # jobs finish while the heartbeat keeps their leases; a drain longer than the lease would otherwise
+        # let another worker reclaim and re-run them.
+        with self.lock:
+            self.stopped.set()
+        self.wake.set()
+        try:
+            self.executor.shutdown(wait=wait)
+        finally:
+            self.released.set()
@@ -1,12 +1,15 @@
-from fastapi import FastAPI, Depends, HTTPException
+import os, io, csv, json
+from typing import Optional
+from datetime import date, datetime
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from sqlalchemy import select, func, case
 from sqlalchemy.orm import Session
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
-from database import Base, engine, SessionLocal
-import models, schemas
-from runner import run_job
+from database import SessionLocal, migrate
+import models, schemas, metrics, search
 
-Base.metadata.create_all(bind=engine)
+migrate()
 app = FastAPI(title="Creator Profiler — Queued (AI + Web Search)")
 
 def get_db():
@@ -16,63 +19,267 @@ def get_db():
     finally:
         db.close()
 
-def process_queue():
-    db = SessionLocal()
-    try:
-        pending = db.query(models.CreatorJob).filter(models.CreatorJob.status.in_(["queued","running"]))\
-                 .order_by(models.CreatorJob.created_at.asc()).all()
-        for job in pending:
-            try:
-                job.status = "running"; db.commit(); db.refresh(job)
-                run_job(db, job)
-                job.status = "done"; job.error_message = ""; db.commit()
-            except Exception as e:
-                job.status = "error"; job.error_message = str(e); db.commit()
-    finally:
-        db.close()
+# Queue processing belongs to `python -m worker`; the API only enqueues and reads. Single-instance
+# deployments can set EMBEDDED_WORKER=1 to run a dispatcher in this process, which submissions wake directly.
+pool = None
+if os.getenv("EMBEDDED_WORKER", "") in ("1", "true", "yes"):
+    from jobqueue import WorkerPool
+    pool = WorkerPool().start()
+
+def notify_workers():
+    if pool:
+        pool.notify()
 
-scheduler = BackgroundScheduler()
-scheduler.add_job(process_queue, IntervalTrigger(seconds=60))
-scheduler.start()
+def _new_job(payload: schemas.JobCreate):
+    return models.CreatorJob(name=payload.name.strip(), timeframe=(payload.timeframe or "2020–present").strip(),
+                             yt_channel_url=payload.yt_channel_url or "", podcast_rss=payload.podcast_rss or "",
+                             site_rss=payload.site_rss or "", other_links=payload.other_links or "",
+                             priority=payload.priority or 0, mode=payload.mode or "recent", status="queued")
 
 @app.post("/jobs", response_model=schemas.JobOut)
 def submit_job(payload: schemas.JobCreate, db: Session = Depends(get_db)):
-    job = models.CreatorJob(name=payload.name.strip(), timeframe=(payload.timeframe or "2020–present").strip(),
-                            yt_channel_url=payload.yt_channel_url or "", podcast_rss=payload.podcast_rss or "",
-                            site_rss=payload.site_rss or "", other_links=payload.other_links or "")
+    job = _new_job(payload)
     db.add(job); db.commit(); db.refresh(job)
+    notify_workers()
     return job
 
+BATCH_MAX = int(os.getenv("JOB_BATCH_MAX", "5000"))
+
+async def _raw_body(request: Request) -> bytes:
+    return await request.body()
+
+def _batch_rows(body, content_type):
+    # JSON array (or {"jobs": [...]}), NDJSON, or CSV with JobCreate field names as the header row.
+    try:
+        text = body.decode("utf-8-sig")
+        if "csv" in content_type:
+            return [{k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+                    for row in csv.DictReader(io.StringIO(text))]
+        if "ndjson" in content_type or "jsonl" in content_type:
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        data = json.loads(text)
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise HTTPException(400, f"Could not parse body: {e}")
+    rows = data.get("jobs") if isinstance(data, dict) else data
+    if not isinstance(rows, list): raise HTTPException(400, "Expected a JSON array of jobs")
+    return rows
+
+@app.post("/jobs/batch", response_model=schemas.JobBatchOut)
+def submit_jobs(request: Request, body: bytes = Depends(_raw_body), db: Session = Depends(get_db)):
+    # All rows are validated before anything is written, then inserted in one transaction: the batch
+    # is accepted whole or rejected with every row's errors. Source URLs are normalized by JobCreate,
+    # so creators that share a feed share one fetch when their jobs run.
+    rows = _batch_rows(body, request.headers.get("content-type", "application/json").lower())
+    if not rows: raise HTTPException(400, "Batch is empty")
+    if len(rows) > BATCH_MAX: raise HTTPException(413, f"At most {BATCH_MAX} jobs per batch")
+    payloads, errors = [], []
+    for i, row in enumerate(rows):
+        try:
+            payloads.append(schemas.JobCreate.model_validate(row))
+        except ValidationError as e:
+            errors.append({"row": i, "errors": e.errors(include_url=False, include_context=False)})
+    if errors: raise HTTPException(422, errors[:100])
+    jobs = [_new_job(p) for p in payloads]
+    db.add_all(jobs)
+    db.flush()  # assigns ids in batched INSERTs; read them before commit expires the objects
+    out = [schemas.JobOut.model_validate(j) for j in jobs]
+    sources = {u for p in payloads for u in (p.yt_channel_url, p.podcast_rss, p.site_rss) if u}
+    db.commit()
+    notify_workers()
+    return {"count": len(out), "sources": len(sources), "jobs": out}
+
 @app.get("/jobs", response_model=list[schemas.JobOut])
 def list_jobs(db: Session = Depends(get_db)):
     return db.query(models.CreatorJob).order_by(models.CreatorJob.created_at.desc()).all()
 
+@app.get("/jobs/summary", response_model=schemas.JobSummaryPage)
+def jobs_summary(limit: int = Query(50, ge=1, le=500), before: Optional[int] = None, excerpt: int = Query(280, ge=0, le=5000),
+                 db: Session = Depends(get_db)):
+    # One statement: the page of jobs, their per-item rates and a report excerpt; items are only aggregated for that page.
+    J, CI, R = models.CreatorJob, models.CollectedItem, models.JobReport
+    page = select(J.id).order_by(J.id.desc()).limit(limit)
+    if before is not None:
+        page = page.where(J.id < before)
+    rate = lambda cond: func.avg(case((cond, 1.0), else_=0.0))
+    stats = select(CI.job_id, func.count(CI.id).label("item_count"),
+                   rate(CI.sensational_terms != "").label("sensational_rate"), rate(CI.us_vs_them).label("us_them_rate"),
+                   rate(CI.explicit_language).label("explicit_rate"), rate(CI.monetization != "").label("monetized_rate"))\
+        .where(CI.job_id.in_(page)).group_by(CI.job_id).subquery()
+    rows = db.execute(
+        select(J.id, J.name, J.timeframe, J.status, J.priority, J.error_message, J.updated_at, stats.c.item_count,
+               stats.c.sensational_rate, stats.c.us_them_rate, stats.c.explicit_rate, stats.c.monetized_rate,
+               func.substr(R.report_markdown, 1, excerpt).label("report_excerpt"))
+        .outerjoin(stats, stats.c.job_id == J.id).outerjoin(R, R.job_id == J.id)
+        .where(J.id.in_(page)).order_by(J.id.desc())).mappings().all()
+    jobs = [{k: v for k, v in r.items() if v is not None} for r in rows]
+    return {"jobs": jobs, "next_before": jobs[-1]["id"] if len(jobs) == limit else None}
+
 @app.get("/jobs/{job_id}", response_model=schemas.JobOut)
 def get_job(job_id: int, db: Session = Depends(get_db)):
     job = db.query(models.CreatorJob).get(job_id)
     if not job: raise HTTPException(404, "Job not found")
     return job
 
-@app.get("/reports/{job_id}", response_model=schemas.ReportOut)
-def get_report(job_id: int, db: Session = Depends(get_db)):
-    job = db.query(models.CreatorJob).get(job_id)
+@app.get("/jobs/{job_id}/timings")
+def job_timings(job_id: int, runs: int = Query(1, ge=1, le=50), db: Session = Depends(get_db)):
+    if not db.get(models.CreatorJob, job_id): raise HTTPException(404, "Job not found")
+    return {"job_id": job_id, "runs": metrics.job_timings(db, job_id, runs)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(db: Session = Depends(get_db)):
+    return PlainTextResponse(metrics.render_prometheus(db), media_type="text/plain; version=0.0.4")
+
+@app.post("/jobs/{job_id}/refresh", response_model=schemas.JobOut)
+def refresh_job(job_id: int, full: bool = False, db: Session = Depends(get_db)):
+    # Re-queue a job; by default only new or changed feed items are analyzed. full=true drops stored items first.
+    job = db.get(models.CreatorJob, job_id)
     if not job: raise HTTPException(404, "Job not found")
-    items = db.query(models.CollectedItem).filter_by(job_id=job_id).all()
-    rep = db.query(models.JobReport).filter_by(job_id=job_id).first()
-    md = rep.report_markdown if rep else ""
-    return {"job": job, "items": [{"date": it.date, "title": it.title, "url": it.url, "platform": it.platform,
-            "description": it.description, "sensational_terms": it.sensational_terms, "loaded_terms": it.loaded_terms,
-            "us_vs_them": it.us_vs_them, "explicit_language": it.explicit_language, "monetization": it.monetization} for it in items],
-            "report_markdown": md}
+    if job.status == "running": raise HTTPException(409, "Job is running")
+    if full:
+        import analytics, reports
+        db.query(models.CollectedItem).filter_by(job_id=job_id).delete()
+        db.query(models.BackfillCheckpoint).filter_by(job_id=job_id).delete()
+        analytics.clear(db, job_id)
+        reports.bump_version(db, job_id)
+    job.status = "queued"; job.attempts = 0; job.next_attempt_at = None; job.error_message = ""
+    job.enqueued_at = datetime.utcnow()
+    db.commit(); db.refresh(job)
+    notify_workers()
+    return job
+
+@app.post("/jobs/{job_id}/backfill", response_model=schemas.JobOut)
+def backfill_job(job_id: int, restart: bool = False, db: Session = Depends(get_db)):
+    # Switch a job to backfill mode and queue it. An unfinished backfill resumes from its checkpoints;
+    # restart=true walks the full history again (already stored items are still not re-analyzed).
+    job = db.get(models.CreatorJob, job_id)
+    if not job: raise HTTPException(404, "Job not found")
+    if job.status == "running": raise HTTPException(409, "Job is running")
+    if restart:
+        db.query(models.BackfillCheckpoint).filter_by(job_id=job_id).delete()
+    job.mode = "backfill"
+    job.status = "queued"; job.attempts = 0; job.next_attempt_at = None; job.error_message = ""
+    job.enqueued_at = datetime.utcnow()
+    db.commit(); db.refresh(job)
+    notify_workers()
+    return job
+
+@app.get("/jobs/{job_id}/backfill", response_model=schemas.BackfillOut)
+def backfill_progress(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(models.CreatorJob, job_id)
+    if not job: raise HTTPException(404, "Job not found")
+    from utils import parse_timeframe
+    try:
+        since, until = parse_timeframe(job.timeframe)
+    except ValueError:
+        since = until = None
+    sources = db.query(models.BackfillCheckpoint).filter_by(job_id=job_id).order_by(models.BackfillCheckpoint.id).all()
+    return {"job": job, "since": since and since.isoformat(), "until": until and until.isoformat(), "sources": sources}
+
+def _item_fields(fields):
+    if not fields:
+        return schemas.ITEM_DEFAULT_FIELDS
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in schemas.ItemOut.model_fields]
+    if unknown: raise HTTPException(400, f"Unknown item fields: {', '.join(unknown)}")
+    return names
+
+def _item_page(db, job_id, names, after, limit):
+    # Keyset pagination on id, selecting only the requested columns.
+    CI = models.CollectedItem
+    cols = [CI.id] + [getattr(CI, n) for n in names if n != "id"]
+    rows = db.query(*cols).filter(CI.job_id == job_id, CI.id > after).order_by(CI.id.asc()).limit(limit).all()
+    return [{n: getattr(r, n) for n in names} for r in rows], (rows[-1].id if len(rows) == limit else None)
+
+@app.get("/items/search", response_model=schemas.ItemSearchPage, response_model_exclude_unset=True)
+def search_items(q: Optional[str] = None, flags: Optional[str] = None, platform: Optional[str] = None,
+                 since: Optional[date] = None, until: Optional[date] = None, job_id: Optional[int] = None,
+                 fields: Optional[str] = None, limit: int = Query(50, ge=1, le=1000), before: Optional[int] = None,
+                 db: Session = Depends(get_db)):
+    # Across all jobs, e.g. q=bombshell&flags=us_vs_them&since=2024-01-01&until=2024-12-31. Text goes
+    # through the full-text index; flags are ANDed and use their partial indexes.
+    wanted = [f.strip() for f in (flags or "").split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in search.FLAGS]
+    if unknown: raise HTTPException(400, f"Unknown flags: {', '.join(unknown)}; expected {', '.join(search.FLAGS)}")
+    hits, next_before = search.search_items(db, _item_fields(fields), q=q, flags=wanted, platform=platform, since=since,
+                                            until=until, job_id=job_id, before=before, limit=limit)
+    return {"items": hits, "next_before": next_before}
+
+# Analytics endpoints read the per-job and per-month rollups that runs keep up to date; pandas is
+# only imported when one of them is called.
+@app.get("/analytics/timeline/{job_id}", response_model=schemas.TimelineOut)
+def analytics_timeline(job_id: int, since: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+                       until: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"), top: int = Query(10, ge=0, le=100),
+                       db: Session = Depends(get_db)):
+    import analytics
+    job = db.get(models.CreatorJob, job_id)
+    if not job: raise HTTPException(404, "Job not found")
+    return {"job": job, "months": analytics.timeline(db, job_id, since, until, top)}
+
+@app.get("/analytics/compare", response_model=schemas.CompareOut)
+def analytics_compare(jobs: str, top: int = Query(10, ge=0, le=100), db: Session = Depends(get_db)):
+    import analytics
+    try:
+        ids = list(dict.fromkeys(int(j) for j in jobs.split(",") if j.strip()))
+    except ValueError:
+        raise HTTPException(400, "jobs must be a comma-separated list of job ids")
+    if not 1 <= len(ids) <= 50: raise HTTPException(400, "Compare between 1 and 50 jobs")
+    found = analytics.compare(db, ids, top)
+    missing = set(ids) - {c["job_id"] for c in found}
+    if missing: raise HTTPException(404, f"Jobs not found: {', '.join(map(str, sorted(missing)))}")
+    return {"jobs": found}
+
+@app.get("/reports/{job_id}", response_model=schemas.ReportOut, response_model_exclude_unset=True)
+def get_report(job_id: int, limit: int = Query(100, ge=1, le=1000), after: int = 0, fields: Optional[str] = None,
+               db: Session = Depends(get_db)):
+    job = db.get(models.CreatorJob, job_id)
+    if not job: raise HTTPException(404, "Job not found")
+    import reports
+    items, next_after = _item_page(db, job_id, _item_fields(fields), after, limit)
+    rendered = reports.render(db, job_id, "md")
+    return {"job": job, "items": items, "report_markdown": rendered[0] if rendered else "", "next_after": next_after}
+
+@app.get("/reports/{job_id}/report.{fmt}")
+def report_document(job_id: int, fmt: str, request: Request, db: Session = Depends(get_db)):
+    # The report alone as Markdown, HTML or JSON (the figures the templates render). Rendered once per
+    # report version and format, then served from memory; If-None-Match is answered with a 304.
+    import reports
+    if fmt not in reports.FORMATS: raise HTTPException(404, f"Unknown report format; expected {', '.join(reports.FORMATS)}")
+    if not db.get(models.CreatorJob, job_id): raise HTTPException(404, "Job not found")
+    rendered = reports.render(db, job_id, fmt)
+    if rendered is None: raise HTTPException(404, "Report not ready")
+    body, etag = rendered
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type=reports.FORMATS[fmt][1], headers={"ETag": etag})
+
+@app.get("/reports/{job_id}/items.ndjson")
+def export_items(job_id: int, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    if not db.get(models.CreatorJob, job_id): raise HTTPException(404, "Job not found")
+    names = _item_fields(fields)
+
+    def stream():
+        # Own session: the request-scoped one is closed before a streaming body is sent.
+        sdb = SessionLocal()
+        try:
+            after = 0
+            while after is not None:
+                page, after = _item_page(sdb, job_id, names, after, 1000)
+                yield "".join(json.dumps(it) + "\n" for it in page)
+        finally:
+            sdb.close()
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 # --- Quick manual trigger endpoints (add at the end of main.py) ---
 @app.get("/run-now")
-def run_now():
-    # Process any queued jobs immediately
-    process_queue()
-    return {"status": "ok"}
+def run_now(db: Session = Depends(get_db)):
+    # Claim whatever fits in free worker slots and return at once; the jobs run in the background
+    return _trigger(db)
 
 @app.post("/run-queue")
-def run_queue():
+def run_queue(db: Session = Depends(get_db)):
     # Same as above but POST, for Swagger button
-    process_queue()
-    return {"status": "ok"}
+    return _trigger(db)
+
+def _trigger(db):
+    queued = [jid for (jid,) in db.query(models.CreatorJob.id).filter(models.CreatorJob.status == "queued")]
+    return {"status": "ok", "claimed": pool.dispatch() if pool else [], "queued": queued}
@@ -0,0 +1,154 @@
+import os, time, uuid, threading, contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from database import bulk_insert
+import models
+
+# Upper bounds in seconds, shared by every histogram on /metrics.
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+BUCKETS_MS = [b * 1000.0 for b in BUCKETS]
+# Per-run timings (GET /jobs/{id}/timings) are kept this long; /metrics reads metric_totals instead.
+RETENTION_DAYS = float(os.getenv("JOB_METRICS_RETENTION_DAYS", "30"))
+
+_current = contextvars.ContextVar("job_timings", default=None)
+
+class JobTimings:
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds, source="", items=0, nbytes=0):
+        with self.lock:
+            self.records.append({"job_id": self.job_id, "run_id": self.run_id, "stage": stage, "source": source,
+                                 "duration_ms": seconds * 1000.0, "items": items or 0, "bytes": nbytes or 0,
+                                 "created_at": datetime.utcnow()})
+
+@contextmanager
+def job_run(job_id):
+    # Everything observed in this context (and in threads started with copy_context) lands in one run.
+    timings = JobTimings(job_id)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+def observe(stage, seconds, source="", items=0, nbytes=0):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds, source, items, nbytes)
+
+@contextmanager
+def stage(name, source=""):
+    # The yielded dict lets the caller attach "items" and "bytes" counts before the stage closes.
+    counts = {}
+    t0 = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        observe(name, time.perf_counter() - t0, source, counts.get("items", 0), counts.get("bytes", 0))
+
+def _add_totals(db, records):
+    T = models.MetricTotal
+    totals = {}
+    for r in records:
+        key = (r["stage"], r["source"], bisect_left(BUCKETS_MS, r["duration_ms"]))
+        acc = totals.setdefault(key, [0, 0.0, 0])
+        acc[0] += 1; acc[1] += r["duration_ms"]; acc[2] += r["bytes"]
+
+    def bump(key, acc):
+        stage_name, source, bucket = key
+        return db.query(T).filter_by(stage=stage_name, source=source, bucket=bucket).update(
+            {"count": T.count + acc[0], "sum_ms": T.sum_ms + acc[1], "bytes": T.bytes + acc[2]},
+            synchronize_session=False)
+    missing = [(key, acc) for key, acc in totals.items() if not bump(key, acc)]
+    db.commit()
+    for (stage_name, source, bucket), acc in missing:
+        db.add(T(stage=stage_name, source=source, bucket=bucket, count=acc[0], sum_ms=acc[1], bytes=acc[2]))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # another worker created the series first
+            bump((stage_name, source, bucket), acc)
+            db.commit()
+
+def save(db, timings):
+    bulk_insert(db, models.JobMetric, timings.records)
+    db.query(models.JobMetric).filter(models.JobMetric.created_at < datetime.utcnow() - timedelta(days=RETENTION_DAYS)) \
+        .delete(synchronize_session=False)
+    db.commit()
+    _add_totals(db, timings.records)
+
+def job_timings(db, job_id, runs=1):
+    M = models.JobMetric
+    run_ids = [r for (r,) in db.query(M.run_id).filter(M.job_id == job_id).group_by(M.run_id)
+               .order_by(func.max(M.id).desc()).limit(runs)]
+    rows = db.query(M).filter(M.job_id == job_id, M.run_id.in_(run_ids)).order_by(M.id.asc()).all()
+    return [{"run_id": rid, "stages": [{"stage": r.stage, "source": r.source, "duration_ms": round(r.duration_ms, 3),
+                                        "items": r.items, "bytes": r.bytes, "at": r.created_at.isoformat()}
+                                       for r in rows if r.run_id == rid]} for rid in run_ids]
+
+HISTOGRAMS = [
+    # (metric, help, stage filter, label name for source)
+    ("creator_profiler_queue_wait_seconds", "Time from enqueue (or retry due time) to job start.", "queue_wait", None),
+    ("creator_profiler_stage_seconds", "Duration of job pipeline stages.", None, "stage"),
+    ("creator_profiler_source_fetch_seconds", "Fetch and parse time per ingest source.", "fetch", "source"),
+    ("creator_profiler_external_api_seconds", "Latency of outbound HTTP/API calls by provider.", "api", "provider"),
+]
+
+def _label(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"')
+
+def render_prometheus(db):
+    # Histograms come from metric_totals, which every worker process adds to after each run.
+    T = models.MetricTotal
+    series = {}
+    for stage_name, source, bucket, count, total_ms, nbytes in db.query(T.stage, T.source, T.bucket, T.count, T.sum_ms, T.bytes):
+        acc = series.setdefault((stage_name, source), [0, 0.0, 0, [0] * len(BUCKETS)])
+        acc[0] += count; acc[1] += total_ms or 0.0; acc[2] += nbytes or 0
+        for i in range(bucket, len(BUCKETS)):
+            acc[3][i] += count
+    grouped = [(stage_name, source, count, total_ms, nbytes, *buckets)
+               for (stage_name, source), (count, total_ms, nbytes, buckets) in series.items()]
+    out = []
+    for metric, help_text, stage_filter, label in HISTOGRAMS:
+        series = {}
+        for stage_name, source, count, total_ms, _, *buckets in grouped:
+            if stage_filter is None:
+                if stage_name in ("queue_wait", "fetch", "api"):
+                    continue
+                key = stage_name
+            elif stage_name != stage_filter:
+                continue
+            else:
+                # feed hosts are collapsed into one provider to keep label cardinality bounded
+                key = (source or "").split(":", 1)[0] if label == "provider" else source
+            acc = series.setdefault(key, [0, 0.0, [0] * len(BUCKETS)])
+            acc[0] += count; acc[1] += (total_ms or 0) / 1000.0
+            acc[2] = [a + (b or 0) for a, b in zip(acc[2], buckets)]
+        out += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+        for key, (count, total, buckets) in sorted(series.items()):
+            lbl = f'{label}="{_label(key)}"' if label else ""
+            for b, n in zip(BUCKETS + ["+Inf"], buckets + [count]):
+                out.append(f'{metric}_bucket{{{lbl + "," if lbl else ""}le="{b}"}} {n}')
+            suffix = f"{{{lbl}}}" if lbl else ""
+            out.append(f"{metric}_sum{suffix} {total}")
+            out.append(f"{metric}_count{suffix} {count}")
+    out += ["# HELP creator_profiler_fetched_bytes_total Response bytes received from external hosts.",
+            "# TYPE creator_profiler_fetched_bytes_total counter"]
+    fetched = {}
+    for stage_name, source, _, _, nbytes, *_ in grouped:
+        if stage_name in ("api", "download"):
+            provider = (source or "").split(":", 1)[0]
+            fetched[provider] = fetched.get(provider, 0) + (nbytes or 0)
+    out += [f'creator_profiler_fetched_bytes_total{{provider="{_label(p)}"}} {n}' for p, n in sorted(fetched.items())]
+    J = models.CreatorJob
+    out += ["# HELP creator_profiler_jobs Jobs by status.", "# TYPE creator_profiler_jobs gauge"]
+    out += [f'creator_profiler_jobs{{status="{_label(s)}"}} {n}'
+            for s, n in db.query(J.status, func.count(J.id)).group_by(J.status).order_by(J.status)]
+    return "\n".join(out) + "\n"
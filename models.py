@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+import logging
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, Boolean, ForeignKey, Index, event, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
 
+log = logging.getLogger(__name__)
+
+ITEM_FLAGS = ("us_vs_them", "explicit_language", "clickbait", "appeal_authority", "appeal_common_sense",
+              "appeal_emotion", "anecdote_as_trend")
+
 class CreatorJob(Base):
     __tablename__ = "creator_jobs"
     id = Column(Integer, primary_key=True, index=True)
@@ -13,9 +20,16 @@ class CreatorJob(Base):
     site_rss = Column(Text, default="")
     other_links = Column(Text, default="")
     status = Column(String, default="queued")
+    priority = Column(Integer, default=0, index=True)
+    mode = Column(String, default="recent")  # "recent": latest feed window; "backfill": full history in the timeframe
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     error_message = Column(Text, default="")
+    worker_id = Column(String, default="")
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    enqueued_at = Column(DateTime, default=datetime.utcnow)  # last move to "queued" (retries: when due); queue wait starts here
     items = relationship("CollectedItem", back_populates="job", cascade="all, delete")
 
 class CollectedItem(Base):
@@ -32,10 +46,158 @@ class CollectedItem(Base):
     us_vs_them = Column(Boolean, default=False)
     explicit_language = Column(Boolean, default=False)
     monetization = Column(Text, default="")
+    clickbait = Column(Boolean, default=False)
+    appeal_authority = Column(Boolean, default=False)
+    appeal_common_sense = Column(Boolean, default=False)
+    appeal_emotion = Column(Boolean, default=False)
+    anecdote_as_trend = Column(Boolean, default=False)
+    affiliations_found = Column(Text, default="")
+    ideology_hits = Column(Text, default="")
+    item_key = Column(String, nullable=True)
+    content_hash = Column(String, default="")
     job = relationship("CreatorJob", back_populates="items")
+    __table_args__ = (
+        Index("ix_collected_items_job_date", "job_id", "date"),
+        Index("ux_collected_items_job_item", "job_id", "item_key", unique=True),
+        Index("ix_collected_items_platform_date", "platform", "date"),
+        # Flagged items are the minority, so each flag gets a partial index over just its rows, by date.
+        *[Index(f"ix_collected_items_{flag}", "date", sqlite_where=text(f"{flag} = 1"),
+                postgresql_where=text(f"{flag} = true")) for flag in ITEM_FLAGS],
+    )
 
 class JobReport(Base):
     __tablename__ = "job_reports"
     id = Column(Integer, primary_key=True, index=True)
     job_id = Column(Integer, ForeignKey("creator_jobs.id"), nullable=False, unique=True)
-    report_markdown = Column(Text, default="")
+    report_markdown = Column(Text, default="")  # as rendered at the end of the last run; excerpts read it
+    # What a run gathers besides items (footnotes, reach, reception links, AI draft); the rest of the
+    # report is rendered from the job's rollups. version changes whenever either does.
+    context_json = Column(Text, default="")
+    version = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class BackfillCheckpoint(Base):
+    # Progress of a backfill per job and feed: page_url is the page holding the first item not yet stored,
+    # items counts the rows the backfill wrote.
+    __tablename__ = "backfill_checkpoints"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("creator_jobs.id"), nullable=False)
+    source = Column(String, nullable=False)
+    page_url = Column(Text, default="")
+    pages = Column(Integer, default=0)
+    items = Column(Integer, default=0)
+    oldest_date = Column(String, default="")
+    done = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (Index("ux_backfill_checkpoints_job_source", "job_id", "source", unique=True),)
+
+class RollupColumns:
+    # Counts of collected items (rates are count / items) plus JSON term frequencies:
+    # terms_json = {"sensational"|"loaded"|"affiliations"|"ideologies": {term: n}}, monetization_json = {kind: n}.
+    items = Column(Integer, default=0)
+    sensational = Column(Integer, default=0)
+    loaded = Column(Integer, default=0)
+    monetized = Column(Integer, default=0)
+    us_vs_them = Column(Integer, default=0)
+    explicit_language = Column(Integer, default=0)
+    clickbait = Column(Integer, default=0)
+    appeal_authority = Column(Integer, default=0)
+    appeal_common_sense = Column(Integer, default=0)
+    appeal_emotion = Column(Integer, default=0)
+    anecdote_as_trend = Column(Integer, default=0)
+    terms_json = Column(Text, default="{}")
+    monetization_json = Column(Text, default="{}")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class JobRollup(RollupColumns, Base):
+    __tablename__ = "job_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("creator_jobs.id"), nullable=False, unique=True)
+    first_date = Column(String, default="")
+    last_date = Column(String, default="")
+
+class MonthRollup(RollupColumns, Base):
+    # One row per job and calendar month ("YYYY-MM"; "" collects undated items).
+    __tablename__ = "job_month_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("creator_jobs.id"), nullable=False)
+    month = Column(String, nullable=False, default="")
+    __table_args__ = (Index("ux_job_month_rollups_job_month", "job_id", "month", unique=True),)
+
+class FeedCacheEntry(Base):
+    __tablename__ = "feed_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(Text, nullable=False, unique=True)
+    etag = Column(String, default="")
+    last_modified = Column(String, default="")
+    items_json = Column(Text, default="[]")
+    item_limit = Column(Integer, default=0)
+    size_bytes = Column(Integer, default=0)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+    accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ApiCacheEntry(Base):
+    __tablename__ = "api_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False, unique=True)
+    namespace = Column(String, default="", index=True)
+    value_json = Column(Text, default="null")
+    size_bytes = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True, index=True)
+    accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class JobMetric(Base):
+    __tablename__ = "job_metrics"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("creator_jobs.id"), nullable=False, index=True)
+    run_id = Column(String, default="", index=True)
+    stage = Column(String, default="")
+    source = Column(String, default="")
+    duration_ms = Column(Float, default=0.0)
+    items = Column(Integer, default=0)
+    bytes = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class MetricTotal(Base):
+    # Cumulative counts behind /metrics, one row per stage, source and histogram bucket (an index into
+    # metrics.BUCKETS; len(BUCKETS) is +Inf). Each run adds to them, so a scrape reads a few hundred rows
+    # however long job_metrics has been collecting.
+    __tablename__ = "metric_totals"
+    id = Column(Integer, primary_key=True, index=True)
+    stage = Column(String, default="")
+    source = Column(String, default="")
+    bucket = Column(Integer, default=0)
+    count = Column(Integer, default=0)
+    sum_ms = Column(Float, default=0.0)
+    bytes = Column(Integer, default=0)
+    __table_args__ = (Index("ux_metric_totals_series", "stage", "source", "bucket", unique=True),)
+
+FTS_TABLE = "collected_items_fts"
+
+@event.listens_for(Base.metadata, "after_create")
+def _item_search_index(target, connection, **kw):
+    # Full-text index over item titles and descriptions. SQLite: an external-content FTS5 table kept in
+    # sync by triggers. PostgreSQL: a GIN index on the tsvector expression search.py queries with.
+    # migrate() runs create_all on every start, so this is idempotent and backfills existing rows once.
+    if connection.dialect.name == "sqlite":
+        exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {"n": FTS_TABLE}).first()
+        if exists:
+            return
+        try:
+            connection.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, description, "
+                                    "content='collected_items', content_rowid='id', tokenize='porter unicode61')"))
+        except OperationalError as e:
+            log.warning("FTS5 unavailable, item search falls back to LIKE: %s", e)
+            return
+        connection.execute(text(f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON collected_items BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); END"""))
+        connection.execute(text(f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON collected_items BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END"""))
+        connection.execute(text(f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF title, description ON collected_items BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); END"""))
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif connection.dialect.name == "postgresql":
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_collected_items_fts ON collected_items USING gin "
+                                "(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')))"))
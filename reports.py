@@ -0,0 +1,120 @@
+import hashlib, json, os, threading
+from collections import OrderedDict
+from datetime import datetime
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+import models, analytics
+
+# Reports are rendered on request from the job's rollups plus the context its last run stored, through
+# templates compiled once at import. Renders are cached per (job, report version, format); a run or any
+# item change bumps the version, and a template change only needs a restart, not a re-run of every job.
+TEMPLATE_DIR = os.getenv("REPORT_TEMPLATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+FORMATS = {"md": ("report.md.j2", "text/markdown; charset=utf-8"),
+           "html": ("report.html.j2", "text/html; charset=utf-8"),
+           "json": (None, "application/json")}
+
+env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(["html.j2"], default_for_string=False),
+                  keep_trailing_newline=True, auto_reload=False)
+env.filters["pct"] = lambda v: f"{v:.0%}"
+env.filters["thousands"] = lambda v: f"{v:,}"
+TEMPLATES = {fmt: env.get_template(name) for fmt, (name, _) in FORMATS.items() if name}
+# Part of every ETag, so clients revalidate after the templates change.
+FINGERPRINT = hashlib.sha1(b"".join(env.loader.get_source(env, t.name)[0].encode("utf-8")
+                                    for t in TEMPLATES.values())).hexdigest()[:12]
+
+class RenderCache:
+    # In-process LRU of rendered bodies, bounded by entry count and total size. Keys carry the report
+    # version, so stale renders are never served; they just age out.
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries or int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "512"))
+        self.max_bytes = max_bytes or int(os.getenv("REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.entries, self.size, self.lock = OrderedDict(), 0, threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = body
+            self.size += len(body)
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                _, old = self.entries.popitem(last=False)
+                self.size -= len(old)
+
+RENDERS = RenderCache()
+
+def _score(agg):
+    # Heuristic factuality score from sensationalism and monetization rates.
+    calm = agg["sensational_rate"] < 0.2
+    parts = {"source_transparency": 10 if agg["monetized_rate"] > 0 else 15, "evidence_quality": 10,
+             "corrections_culture": 5, "context_discipline": 10 if calm else 5, "headline_alignment": 6 if calm else 3}
+    caps = {"source_transparency": 25, "evidence_quality": 25, "corrections_culture": 20, "context_discipline": 20,
+            "headline_alignment": 10}
+    return {**parts, "total": sum(min(caps[k], v) for k, v in parts.items())}
+
+def build_context(db, job, report):
+    agg = analytics.report_aggregates(analytics.job_rollup(db, job.id))
+    stored = json.loads(report.context_json or "{}")
+    CI = models.CollectedItem
+    examples = [t for (t,) in db.query(CI.title).filter(CI.job_id == job.id)
+                .order_by(CI.date.desc(), CI.id.asc()).limit(3)]
+    return {"job": {"id": job.id, "name": job.name, "timeframe": job.timeframe}, "version": report.version,
+            "total": agg["total"], "examples": examples,
+            "rates": {k: round(agg[f"{k}_rate"], 4) for k in ("sensational", "us_them", "explicit", "monetized")},
+            "ideologies": sorted(agg["ideologies"]), "affiliations": sorted(agg["affiliations"]),
+            "flags": {f: agg[f] for f in analytics.FLAG_COUNTS[2:]}, "score": _score(agg),
+            "reach": stored.get("reach") or {}, "controversies": stored.get("controversies") or [],
+            "refs": stored.get("refs") or [], "ai_text": stored.get("ai_text") or ""}
+
+def render(db, job_id, fmt):
+    # (body, etag), or None when the job has no report yet. A cached render costs one read of the version.
+    row = db.query(models.JobReport.version).filter_by(job_id=job_id).first()
+    if row is None:
+        return None
+    version = row.version
+    body = RENDERS.get((job_id, version, fmt))
+    if body is None:
+        report = db.query(models.JobReport).filter_by(job_id=job_id).first()
+        if report is None:
+            return None
+        version = report.version  # a run may have bumped it since; cache under the one rendered
+        if not report.context_json and report.report_markdown and fmt == "md":
+            body = report.report_markdown  # stored by a run before templates; replaced on the next run
+        else:
+            context = build_context(db, db.get(models.CreatorJob, job_id), report)
+            body = json.dumps(context) if fmt == "json" else TEMPLATES[fmt].render(**context)
+        RENDERS.put((job_id, version, fmt), body)
+    return body, f'"{job_id}-{version}-{fmt}-{FINGERPRINT}"'
+
+def bump_version(db, job_id):
+    # Call when the job's items change; the caller commits.
+    R = models.JobReport
+    db.query(R).filter_by(job_id=job_id).update({"version": R.version + 1, "updated_at": datetime.utcnow()},
+                                                synchronize_session=False)
+
+def save(db, job, context):
+    # Store what the run gathered, which invalidates every cached render of the job, and keep the Markdown
+    # as of this run in report_markdown for the /jobs/summary excerpts (read in SQL, without rendering).
+    R = models.JobReport
+    body = json.dumps(context)
+    db.commit()  # end the read snapshot before writing (see jobqueue.claim)
+    if not db.query(R).filter_by(job_id=job.id).update(
+            {"context_json": body, "version": R.version + 1, "updated_at": datetime.utcnow()}, synchronize_session=False):
+        db.add(R(job_id=job.id, context_json=body, version=1))
+    db.commit()
+    report = db.query(R).filter_by(job_id=job.id).one()
+    md = TEMPLATES["md"].render(**build_context(db, job, report))
+    db.commit()
+    db.query(R).filter_by(id=report.id).update({"report_markdown": md}, synchronize_session=False)
+    db.commit()
+    RENDERS.put((job.id, report.version, "md"), md)
+    return len(md.encode("utf-8"))
@@ -1,11 +1,20 @@
 from sqlalchemy.orm import Session
-import models
+import models, analytics, reports
+from database import bulk_insert, bulk_update
 from utils import (
-    parse_generic_rss, yt_channel_id_from_url, yt_rss_from_channel_id, analyze_text, monetization_signals,
-    build_chicago_note, today_iso, fetch_youtube_channel_stats, search_reception_queries, ai_sections
+    parse_generic_rss, yt_channel_id_from_url, yt_rss_from_channel_id, analyze_many, monetization_signals,
+    build_chicago_note, today_iso, item_key, content_hash, fetch_youtube_channel_stats, search_reception_queries, ai_sections,
+    iter_feed_history, parse_timeframe
 )
+from schemas import normalize_url
+from ingest import gather, FEED_TIMEOUT, API_TIMEOUT
+from metrics import stage
+from functools import partial
 import os
 
+# Backfilled items are analyzed and written this many at a time, so a 10,000-entry feed never sits in memory.
+BACKFILL_CHUNK = int(os.getenv("BACKFILL_CHUNK", "200"))
+
 SECTION_ORDER = [
     "Overview","Content Themes & Direction","Language & Tone","Political/Ideological/Theological Views",
     "Rhetorical & Persuasive Strategies","Monetization & Consumerism","Reach & Influence",
@@ -13,156 +22,185 @@ SECTION_ORDER = [
     "Parental Guidance","Conclusion & Takeaway for Parents","Factuality Score (Heuristic)","Footnotes"
 ]
 
+ITEM_FIELDS = ["date","title","url","platform","description","sensational_terms","loaded_terms","us_vs_them",
+               "explicit_language","clickbait","appeal_authority","appeal_common_sense","appeal_emotion",
+               "anecdote_as_trend","affiliations_found","ideology_hits","monetization"]
+FLAG_FIELDS = ["us_vs_them","explicit_language","clickbait","appeal_authority","appeal_common_sense","appeal_emotion","anecdote_as_trend"]
+
+def _tag(items, platform):
+    analyses = analyze_many(it.get("title","") + " " + it.get("description","") for it in items)
+    for it, analysis in zip(items, analyses):
+        it.update(analysis)
+        it["monetization"] = monetization_signals(it.get("description",""))
+        it["platform"] = platform
+    return items
+
+def _row_values(it):
+    row = {k: it.get(k, "") for k in ITEM_FIELDS}
+    row.update({k: bool(it.get(k, False)) for k in FLAG_FIELDS})
+    row.update(item_key=it["item_key"], content_hash=it["content_hash"])
+    return row
+
+def _item_dict(row):
+    return {k: getattr(row, k) for k in ITEM_FIELDS}
+
+def _store_changed(db, job, fresh):
+    # Items are keyed by feed GUID (or URL) plus platform; only unseen or edited entries are analyzed
+    # and written, and rows that dropped out of the feed window are kept as history.
+    CI = models.CollectedItem
+    keys = list({item_key(platform, it) for platform, it in fresh})
+    existing = {}
+    for i in range(0, len(keys), 500):
+        existing.update((key, (rid, digest, date)) for rid, key, digest, date in
+                        db.query(CI.id, CI.item_key, CI.content_hash, CI.date)
+                        .filter(CI.job_id == job.id, CI.item_key.in_(keys[i:i + 500])))
+    legacy = db.query(CI.id).filter(CI.job_id == job.id, CI.item_key.is_(None)).first()
+    db.commit()  # end the read snapshot before writing (see jobqueue.claim)
+    if legacy:
+        # Rows stored before items had keys cannot be matched; replace them once.
+        db.query(CI).filter_by(job_id=job.id).delete()
+        existing = {}
+    changed = {}
+    for platform, it in fresh:
+        key, digest = item_key(platform, it), content_hash(it)
+        if key not in changed and existing.get(key, (None, None, None))[1] != digest:
+            it.update(item_key=key, content_hash=digest)
+            changed[key] = (platform, it)
+    with stage("analyze") as counts:
+        for platform in {p for p, _ in changed.values()}:
+            _tag([it for p, it in changed.values() if p == platform], platform)
+        counts["items"] = len(changed)
+    inserts, updates = [], []
+    for key, (_, it) in changed.items():
+        if key in existing:
+            updates.append({"id": existing[key][0], **_row_values(it)})
+        else:
+            inserts.append({"job_id": job.id, **_row_values(it)})
+    with stage("persist") as counts:
+        bulk_update(db, CI, updates)
+        bulk_insert(db, CI, inserts)
+        db.commit()
+        counts["items"] = len(updates) + len(inserts)
+    if changed or legacy:
+        # Only the months an added or edited item falls in (before and after the edit) are re-rolled.
+        months = None if legacy else {(it.get("date") or "")[:7] for _, it in changed.values()} | \
+            {(existing[key][2] or "")[:7] for key in changed if key in existing}
+        with stage("rollup"):
+            analytics.refresh(db, job.id, months)
+            reports.bump_version(db, job.id)
+            db.commit()
+    return len(changed)
+
+def _backfill(db, job, feeds, warnings):
+    # Walks each feed's full history within the job's timeframe, storing it BACKFILL_CHUNK items at a
+    # time. After every chunk the source's checkpoint records the page being read, so a backfill that
+    # is interrupted (crash, lease loss, retry) resumes on that page; items it already stored are
+    # recognised by key and hash and skipped.
+    try:
+        since, until = parse_timeframe(job.timeframe)
+    except ValueError as e:
+        since = until = None
+        warnings.append(f"{e}; backfilled full history")
+    BC = models.BackfillCheckpoint
+    stored = 0
+    for key, url, platform, _ in feeds:
+        cp = db.query(BC).filter_by(job_id=job.id, source=key).first()
+        if cp is None:
+            cp = BC(job_id=job.id, source=key, page_url=url, pages=0, items=0, oldest_date="")
+            db.add(cp); db.commit()
+        chunk, pages, current = [], cp.pages or 0, cp.page_url if cp.pages else None
+
+        def flush(page):
+            nonlocal stored
+            written = _store_changed(db, job, chunk)
+            stored += written
+            dates = [it["date"] for _, it in chunk if it.get("date")]
+            cp.page_url, cp.pages, cp.items = page, pages, (cp.items or 0) + written
+            if dates:
+                cp.oldest_date = min([d for d in (cp.oldest_date, *dates) if d])
+            db.commit()
+            chunk.clear()
+        # A failure propagates: the job is retried and picks up from the last checkpoint.
+        for page, it in iter_feed_history(url, since, until, FEED_TIMEOUT, cp.page_url or url):
+            if page != current:
+                current, pages = page, pages + 1
+            chunk.append((platform, it))
+            if len(chunk) >= BACKFILL_CHUNK:
+                flush(page)
+        flush(current or cp.page_url)
+        cp.done = True
+        db.commit()
+    return stored
+
 def run_job(db: Session, job: models.CreatorJob):
-    refs, items = [], []
-    channel_id = ""
-    if job.yt_channel_url:
-        channel_id = yt_channel_id_from_url(job.yt_channel_url)
-        if channel_id:
-            rss = yt_rss_from_channel_id(channel_id)
-            y_items = parse_generic_rss(rss, limit=40)
-            for it in y_items:
-                analysis = analyze_text((it.get("title","") + " " + it.get("description","")))
-                it.update(analysis)
-                it["monetization"] = monetization_signals(it.get("description",""))
-                it["platform"] = "YouTube"
-            items.extend(y_items)
-            refs.append(build_chicago_note(rss, "YouTube Channel RSS feed", today_iso()))
+    refs, warnings = [], []
+    channel_id = yt_channel_id_from_url(job.yt_channel_url) if job.yt_channel_url else ""
+    feeds = []
+    if channel_id:
+        feeds.append(("youtube", yt_rss_from_channel_id(channel_id), "YouTube", "YouTube Channel RSS feed"))
+    # Jobs stored before URLs were normalized on submit still share fetches with newer ones.
     if job.podcast_rss:
-        p_items = parse_generic_rss(job.podcast_rss, limit=40)
-        for it in p_items:
-            analysis = analyze_text((it.get("title","") + " " + it.get("description","")))
-            it.update(analysis)
-            it["monetization"] = monetization_signals(it.get("description",""))
-            it["platform"] = "Podcast"
-        items.extend(p_items)
-        refs.append(build_chicago_note(job.podcast_rss, "Podcast RSS feed", today_iso()))
+        feeds.append(("podcast", normalize_url(job.podcast_rss), "Podcast", "Podcast RSS feed"))
     if job.site_rss:
-        s_items = parse_generic_rss(job.site_rss, limit=40)
-        for it in s_items:
-            analysis = analyze_text((it.get("title","") + " " + it.get("description","")))
-            it.update(analysis)
-            it["monetization"] = monetization_signals(it.get("description",""))
-            it["platform"] = "Website/Blog"
-        items.extend(s_items)
-        refs.append(build_chicago_note(job.site_rss, "Website/Blog RSS feed", today_iso()))
+        feeds.append(("site", normalize_url(job.site_rss), "Website/Blog", "Website/Blog RSS feed"))
+
+    # In backfill mode a feed is walked in full until its checkpoint is done; afterwards it is
+    # refreshed like any other, through the latest-items window below.
+    backfill = []
+    if job.mode == "backfill":
+        done = {source for (source,) in db.query(models.BackfillCheckpoint.source)
+                .filter_by(job_id=job.id, done=True)}
+        backfill = [f for f in feeds if f[0] not in done]
+        db.commit()
+    pending = {f[0] for f in backfill}
+    tasks = [(key, partial(parse_generic_rss, url, limit=40, timeout=FEED_TIMEOUT), FEED_TIMEOUT)
+             for key, url, _, _ in feeds if key not in pending]
+    yapi = os.getenv("YOUTUBE_API_KEY","" ).strip()
+    if yapi and channel_id:
+        tasks.append(("reach", partial(fetch_youtube_channel_stats, channel_id, yapi), API_TIMEOUT))
+    serp = os.getenv("SERPAPI_KEY","" ).strip()
+    if serp:
+        tasks.append(("reception", partial(search_reception_queries, job.name, serp, num=5), API_TIMEOUT))
+    fetched, errors = gather(tasks)
+    warnings.extend(f"{key}: {e}" for key, e in errors.items())
+
+    fresh = []
+    for key, url, platform, label in feeds:
+        if key in fetched:
+            fresh.extend((platform, it) for it in fetched[key])
+        if key in fetched or key in pending:
+            refs.append(build_chicago_note(url, label, today_iso()))
     if job.other_links:
         for line in job.other_links.splitlines():
             u = line.strip()
             if u:
                 refs.append(build_chicago_note(u, "Additional source", today_iso()))
 
-    db.query(models.CollectedItem).filter_by(job_id=job.id).delete()
-    for it in items:
-        db.add(models.CollectedItem(
-            job_id=job.id, date=it.get("date",""), title=it.get("title",""), url=it.get("url",""),
-            platform=it.get("platform",""), description=it.get("description",""),
-            sensational_terms=it.get("sensational_terms",""), loaded_terms=it.get("loaded_terms",""),
-            us_vs_them=bool(it.get("us_vs_them", False)), explicit_language=bool(it.get("explicit_language", False)),
-            monetization=it.get("monetization","")
-        ))
-    db.commit()
-
-    total = max(1, len(items))
-    sensational_rate = sum(1 for it in items if it.get("sensational_terms"))/total
-    us_them_rate = sum(1 for it in items if it.get("us_vs_them"))/total
-    explicit_rate = sum(1 for it in items if it.get("explicit_language"))/total
-    monetized_rate = sum(1 for it in items if it.get("monetization"))/total
-
-    affiliations_all = set(sum([it.get("affiliations_found","" ).split(", ") for it in items if it.get("affiliations_found")], []))
-    affiliations_all = {a for a in affiliations_all if a}
-    ideology_all = set(sum([it.get("ideology_hits","" ).split(", ") for it in items if it.get("ideology_hits")], []))
-    ideology_all = {a for a in ideology_all if a}
-
-    reach = {}
-    yapi = os.getenv("YOUTUBE_API_KEY","" ).strip()
-    if yapi and channel_id:
-        reach = fetch_youtube_channel_stats(channel_id, yapi)
+    _store_changed(db, job, fresh)
+    if backfill:
+        with stage("backfill") as counts:
+            counts["items"] = _backfill(db, job, backfill, warnings)
+    with stage("aggregate") as counts:
+        agg = analytics.report_aggregates(analytics.job_rollup(db, job.id))
+        items = [_item_dict(it) for it in db.query(models.CollectedItem).filter_by(job_id=job.id)
+                 .order_by(models.CollectedItem.date.desc(), models.CollectedItem.id.asc()).limit(25)]
+        counts["items"] = agg["total"]
+    affiliations_all, ideology_all = agg["affiliations"], agg["ideologies"]
 
-    controversies = []
-    serp = os.getenv("SERPAPI_KEY","" ).strip()
-    if serp:
-        controversies = search_reception_queries(job.name, serp, num=5)
-        for title, url in controversies:
-            refs.append(build_chicago_note(url, title, today_iso()))
+    reach = fetched.get("reach") or {}
 
-    source_transparency = 10 if monetized_rate>0 else 15
-    evidence_quality = 10
-    corrections_culture = 5
-    context_discipline = 10 if sensational_rate<0.2 else 5
-    headline_alignment = 6 if sensational_rate<0.2 else 3
-    total_score = min(25,source_transparency)+min(25,evidence_quality)+min(20,corrections_culture)+min(20,context_discipline)+min(10,headline_alignment)
+    controversies = fetched.get("reception") or []
+    for title, url in controversies:
+        refs.append(build_chicago_note(url, title, today_iso()))
 
     ai_text = ""
     oai = os.getenv("OPENAI_API_KEY","" ).strip()
     if oai:
-        ai_text = ai_sections(job.name, job.timeframe, items, affiliations_all, ideology_all, reach, controversies, oai)
-
-    footnotes = "\n".join([f"[{i+1}] {r}" for i,r in enumerate(refs)])
-    examples = ", ".join([it["title"] for it in items[:3]]) if items else ""
-    reach_line = ""
-    if reach:
-        reach_line = f"- YouTube: {reach.get('subscriberCount',0):,} subscribers; {reach.get('viewCount',0):,} total views; {reach.get('videoCount',0):,} videos."
-
-    header_md = f"""Overview
-Creator: {job.name}
-Primary Platform(s): YouTube, podcasts, social media
-Timeframe: {job.timeframe}
-
-Content Themes & Direction
-- Auto-collected {len(items)} items across provided feeds. Examples: {examples}
-
-Language & Tone
-- Sensational phrasing in ~{sensational_rate:.0%} of titles/descriptions.
-- 'Us vs. them' framing in ~{us_them_rate:.0%}; explicit language in ~{explicit_rate:.0%}.
-
-Political/Ideological/Theological Views
-- Detected ideology mentions: {', '.join(sorted(ideology_all)) or 'None auto-detected'}
-- Topics to review manually: culture war themes, moral framing, theological references if present.
-
-Rhetorical & Persuasive Strategies
-- Clickbait/exaggeration indicators present: {any(it.get('clickbait') for it in items)}
-- Anecdote-as-trend present: {any(it.get('anecdote_as_trend') for it in items)}
-- Appeals: authority={any(it.get('appeal_authority') for it in items)}, common-sense={any(it.get('appeal_common_sense') for it in items)}, emotion={any(it.get('appeal_emotion') for it in items)}
-
-Monetization & Consumerism
-- Monetization signals detected in ~{monetized_rate:.0%} of items (sponsor/promo/affiliate/membership/merch).
-
-Reach & Influence
-{reach_line or '- RSS does not expose audience counts; add API keys to auto-fill reach metrics.'}
-
-Affiliations, Sponsorships, Partnerships
-- Auto-detected mentions: {', '.join(sorted(affiliations_all)) or 'None auto-detected'} (validate manually for actual relationships).
-
-Reception & Controversies
-- Auto-fetched links: {len(controversies)} added to footnotes (if web search enabled).
-
-Impact on Teen Viewers
-- Potential emotional effects if sensational or polarized framing is frequent; discuss evidence quality and rhetoric.
-
-Parental Guidance
-- Watch for sensationalism, explicit language, polarizing frames, sponsor pushes. Conversation starters: "What is the claim?", "What evidence is offered?", "Who benefits?"
-
-Conclusion & Takeaway for Parents
-- Automated first pass; confirm with manual sampling before high-stakes conclusions.
-
-Factuality Score (Heuristic)
-- Total: {total_score}/100 (preliminary; driven by sensationalism rate and sourcing proxies).
-
----
-Footnotes
-{footnotes}
-"""
-
-    final_md = (ai_text.strip()+"\n\n" if ai_text else "") + header_md
-    rep = db.query(models.JobReport).filter_by(job_id=job.id).first()
-    if not rep:
-        rep = models.JobReport(job_id=job.id, report_markdown=final_md)
-        db.add(rep)
-    else:
-        rep.report_markdown = final_md
-    db.commit()
-
-    os.makedirs("reports", exist_ok=True)
-    with open(f"reports/job_{job.id}.md", "w", encoding="utf-8") as f:
-        f.write(final_md)
+        with stage("ai"):
+            ai_text = ai_sections(job.name, job.timeframe, items, affiliations_all, ideology_all, reach, controversies, oai)
+
+    # The report itself is rendered on request (see reports.py) from the rollups and this context.
+    with stage("report") as counts:
+        counts["bytes"] = reports.save(db, job, {"refs": refs, "reach": reach, "controversies": controversies,
+                                                 "ai_text": ai_text})
+    return warnings
@@ -1,5 +1,26 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, field_validator
+from typing import Optional, List, Literal, Dict
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit
+
+def normalize_url(url):
+    # One spelling per source, so jobs that share a feed share its cache entry and in-flight fetch:
+    # trimmed, https by default, lowercase scheme and host, no default port, no fragment.
+    u = (url or "").strip()
+    if not u:
+        return ""
+    if "://" not in u and not u.startswith(("/", ".")):
+        u = "https://" + u
+    p = urlsplit(u)
+    scheme = p.scheme.lower()
+    if scheme not in ("http", "https"):
+        return u
+    host = (p.hostname or "").lower()
+    if p.port and (scheme, p.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{p.port}"
+    if p.username:
+        host = p.username + (f":{p.password}" if p.password else "") + "@" + host
+    return urlunsplit((scheme, host, p.path or "/", p.query, ""))
 
 class JobCreate(BaseModel):
     name: str
@@ -8,29 +29,123 @@ class JobCreate(BaseModel):
     podcast_rss: Optional[str] = ""
     site_rss: Optional[str] = ""
     other_links: Optional[str] = ""
+    priority: Optional[int] = 0
+    mode: Optional[Literal["recent", "backfill"]] = "recent"
+
+    @field_validator("yt_channel_url", "podcast_rss", "site_rss")
+    @classmethod
+    def _normalize_source(cls, v):
+        return normalize_url(v)
 
 class JobOut(BaseModel):
     id: int
     name: str
     timeframe: str
     status: str
+    priority: int = 0
+    mode: str = "recent"
     error_message: str = ""
+    updated_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+class BackfillSource(BaseModel):
+    source: str
+    page_url: str = ""
+    pages: int = 0
+    items: int = 0
+    oldest_date: str = ""
+    done: bool = False
+    updated_at: Optional[datetime] = None
     class Config:
         from_attributes = True
 
+class BackfillOut(BaseModel):
+    job: JobOut
+    since: Optional[str] = None
+    until: Optional[str] = None
+    sources: List[BackfillSource]
+
+class JobBatchOut(BaseModel):
+    count: int
+    sources: int  # distinct feed/channel URLs across the batch
+    jobs: List[JobOut]
+
+class JobSummary(BaseModel):
+    id: int
+    name: str
+    timeframe: str
+    status: str
+    priority: int = 0
+    error_message: str = ""
+    updated_at: Optional[datetime] = None
+    item_count: int = 0
+    sensational_rate: float = 0.0
+    us_them_rate: float = 0.0
+    explicit_rate: float = 0.0
+    monetized_rate: float = 0.0
+    report_excerpt: str = ""
+
+class JobSummaryPage(BaseModel):
+    jobs: List[JobSummary]
+    next_before: Optional[int] = None
+
 class ItemOut(BaseModel):
-    date: str
-    title: str
-    url: str
-    platform: str
-    description: str
-    sensational_terms: str
-    loaded_terms: str
-    us_vs_them: bool
-    explicit_language: bool
-    monetization: str
+    # Every field is optional so /reports can return a fields= projection; unrequested fields are omitted.
+    id: Optional[int] = None
+    date: Optional[str] = None
+    title: Optional[str] = None
+    url: Optional[str] = None
+    platform: Optional[str] = None
+    description: Optional[str] = None
+    sensational_terms: Optional[str] = None
+    loaded_terms: Optional[str] = None
+    us_vs_them: Optional[bool] = None
+    explicit_language: Optional[bool] = None
+    clickbait: Optional[bool] = None
+    appeal_authority: Optional[bool] = None
+    appeal_common_sense: Optional[bool] = None
+    appeal_emotion: Optional[bool] = None
+    anecdote_as_trend: Optional[bool] = None
+    affiliations_found: Optional[str] = None
+    ideology_hits: Optional[str] = None
+    monetization: Optional[str] = None
+
+ITEM_DEFAULT_FIELDS = ["id", "date", "title", "url", "platform", "description", "sensational_terms", "loaded_terms",
+                       "us_vs_them", "explicit_language", "monetization"]
+
+class ItemHit(ItemOut):
+    job_id: int
+    creator: str
+
+class ItemSearchPage(BaseModel):
+    items: List[ItemHit]
+    next_before: Optional[int] = None
+
+class RollupOut(BaseModel):
+    items: int = 0
+    rates: Dict[str, float] = {}
+    top_terms: Dict[str, Dict[str, int]] = {}
+    monetization: Dict[str, int] = {}
+
+class MonthOut(RollupOut):
+    month: str
+
+class TimelineOut(BaseModel):
+    job: JobOut
+    months: List[MonthOut]
+
+class CreatorRollupOut(RollupOut):
+    job_id: int
+    creator: str
+    first_date: Optional[str] = None
+    last_date: Optional[str] = None
+
+class CompareOut(BaseModel):
+    jobs: List[CreatorRollupOut]
 
 class ReportOut(BaseModel):
     job: JobOut
     items: List[ItemOut]
     report_markdown: str
+    next_after: Optional[int] = None
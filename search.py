@@ -0,0 +1,69 @@
+import re
+from sqlalchemy import text, and_, or_
+import models
+
+CI = models.CollectedItem
+
+# Filterable flags: the boolean columns plus "has any hit" for the term columns. The boolean tests are
+# written as "= true" so they match the partial indexes' WHERE clauses.
+FLAGS = {**{f: getattr(CI, f) == True for f in models.ITEM_FLAGS},
+         "sensational": CI.sensational_terms != "", "loaded": CI.loaded_terms != "",
+         "monetized": CI.monetization != ""}
+
+_fts_ready = {}
+
+def _has_fts(db):
+    bind = db.get_bind()
+    if bind.url not in _fts_ready:
+        _fts_ready[bind.url] = db.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"),
+                                          {"n": models.FTS_TABLE}).first() is not None
+    return _fts_ready[bind.url]
+
+def _terms(q):
+    # "quoted phrases" stay together, other words are ANDed; a trailing * makes a prefix match.
+    terms = [(m.group(1) or m.group(2), bool(m.group(3))) for m in re.finditer(r'"([^"]+)"|([^\s"*]+)(\*?)', q)]
+    return [(t, prefix) for t, prefix in terms if re.search(r"\w", t)]
+
+def text_match(db, q):
+    terms = _terms(q)
+    if not terms:
+        return None
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite" and _has_fts(db):
+        # Every term quoted, so user input can never be read as FTS5 query syntax.
+        match = " ".join('"%s"%s' % (t.replace('"', '""'), "*" if prefix else "") for t, prefix in terms)
+        return CI.id.in_(text(f"SELECT rowid FROM {models.FTS_TABLE} WHERE {models.FTS_TABLE} MATCH :q")
+                         .bindparams(q=match))
+    if dialect == "postgresql":
+        # Same expression as ix_collected_items_fts so the GIN index is used.
+        query = " ".join(f'"{t}"' if " " in t else t for t, _ in terms)
+        return text("to_tsvector('english', coalesce(collected_items.title, '') || ' ' || "
+                    "coalesce(collected_items.description, '')) @@ websearch_to_tsquery('english', :q)").bindparams(q=query)
+    # LIKE fallback: % and _ in the user's text are matched literally.
+    like = lambda t: "%" + re.sub(r"([\\%_])", r"\\\1", t) + "%"
+    return and_(*[or_(CI.title.ilike(like(t), escape="\\"), CI.description.ilike(like(t), escape="\\")) for t, _ in terms])
+
+def search_items(db, names, q=None, flags=(), platform=None, since=None, until=None, job_id=None,
+                 before=None, limit=50):
+    # Newest rows first with keyset paging on id; returns (hits, next_before).
+    J = models.CreatorJob
+    cols = [CI.id, CI.job_id, J.name.label("creator")] + [getattr(CI, n) for n in names if n != "id"]
+    query = db.query(*cols).join(J, J.id == CI.job_id)
+    match = text_match(db, q) if q else None
+    if match is not None:
+        query = query.filter(match)
+    for f in flags:
+        query = query.filter(FLAGS[f])
+    if platform:
+        query = query.filter(CI.platform == platform)
+    if since:
+        query = query.filter(CI.date >= since.isoformat())
+    if until:
+        query = query.filter(CI.date != "", CI.date <= until.isoformat())
+    if job_id is not None:
+        query = query.filter(CI.job_id == job_id)
+    if before is not None:
+        query = query.filter(CI.id < before)
+    rows = query.order_by(CI.id.desc()).limit(limit).all()
+    hits = [{"job_id": r.job_id, "creator": r.creator, **{n: getattr(r, n) for n in names}} for r in rows]
+    return hits, (rows[-1].id if len(rows) == limit else None)
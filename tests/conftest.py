@@ -0,0 +1,31 @@
+import os, sys, tempfile
+
+# The app reads its settings at import time: point it at a throwaway SQLite file (and working directory,
+# for anything written relative to it) before anything imports database.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="creator-profiler-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{os.getcwd()}/app.db"
+os.environ["EMBEDDED_WORKER"] = ""
+
+import pytest
+
+@pytest.fixture
+def db():
+    import database, models
+    database.migrate()
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(database.Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
@@ -0,0 +1,80 @@
+import json
+from database import bulk_insert
+import analytics, models
+
+M, R = models.MonthRollup, models.JobRollup
+
+def _job(db, items):
+    job = models.CreatorJob(name="rolled", status="done")
+    db.add(job)
+    db.commit()
+    add(db, job.id, items)
+    return job.id
+
+def add(db, job_id, items):
+    bulk_insert(db, models.CollectedItem, [{"job_id": job_id, "platform": "podcast", "title": "t", "date": date,
+                                            "sensational_terms": terms, "us_vs_them": us} for date, terms, us in items])
+    db.commit()
+
+def months(db, job_id):
+    return {m.month: (m.items, m.sensational, m.us_vs_them, json.loads(m.terms_json)["sensational"])
+            for m in db.query(M).filter_by(job_id=job_id)}
+
+def total(db, job_id):
+    r = db.query(R).filter_by(job_id=job_id).one()
+    return (r.items, r.sensational, r.us_vs_them, r.terms_json, r.monetization_json, r.first_date, r.last_date)
+
+ITEMS = [("2024-01-05", "shocking", True), ("2024-01-20", "", False), ("2024-02-02", "shocking, exposed", False), ("", "", True)]
+
+def test_full_refresh_rolls_up_every_month(db):
+    jid = _job(db, ITEMS)
+    analytics.refresh(db, jid)
+    assert months(db, jid) == {"2024-01": (2, 1, 1, {"shocking": 1}), "2024-02": (1, 1, 0, {"shocking": 1, "exposed": 1}),
+                               "": (1, 0, 1, {})}
+    items, sensational, us, terms, *_, first, last = total(db, jid)
+    assert (items, sensational, us, first, last) == (4, 2, 2, "2024-01-05", "2024-02-02")
+    assert json.loads(terms)["sensational"] == {"shocking": 2, "exposed": 1}
+
+def test_incremental_refresh_only_recomputes_the_given_months(db):
+    jid = _job(db, ITEMS)
+    analytics.refresh(db, jid)
+    january = db.query(M).filter_by(job_id=jid, month="2024-01").one().updated_at
+    add(db, jid, [("2024-02-14", "exposed", True), ("2024-03-01", "", False)])
+    analytics.refresh(db, jid, ["2024-02", "2024-03", "2024-02"])
+    db.expire_all()
+    assert db.query(M).filter_by(job_id=jid, month="2024-01").one().updated_at == january
+    assert months(db, jid)["2024-02"] == (2, 2, 1, {"shocking": 1, "exposed": 2})
+    assert months(db, jid)["2024-03"] == (1, 0, 0, {})
+    incremental = total(db, jid)
+    analytics.refresh(db, jid)
+    db.expire_all()
+    assert total(db, jid) == incremental
+
+def test_month_that_lost_its_items_is_dropped(db):
+    jid = _job(db, ITEMS)
+    analytics.refresh(db, jid)
+    db.query(models.CollectedItem).filter_by(job_id=jid, date="2024-02-02").delete()
+    db.commit()
+    analytics.refresh(db, jid, ["2024-02"])
+    assert "2024-02" not in months(db, jid)
+    assert total(db, jid)[:3] == (3, 1, 2)
+
+def test_partial_refresh_without_a_rollup_builds_the_whole_job(db):
+    jid = _job(db, ITEMS)
+    analytics.refresh(db, jid, ["2024-02"])
+    assert set(months(db, jid)) == {"2024-01", "2024-02", ""}
+    analytics.refresh(db, jid, [])
+    assert total(db, jid)[0] == 4
+
+def test_job_rollup_is_built_on_first_use(db):
+    jid = _job(db, ITEMS)
+    assert db.query(R).filter_by(job_id=jid).first() is None
+    assert analytics.job_rollup(db, jid).items == 4
+
+def test_timeline_and_compare_endpoints(client, db):
+    jid = _job(db, ITEMS)
+    tl = client.get(f"/analytics/timeline/{jid}", params={"since": "2024-02"}).json()
+    assert [(m["month"], m["items"]) for m in tl["months"]] == [("2024-02", 1)]
+    assert tl["months"][0]["rates"]["sensational"] == 1.0
+    cmp = client.get("/analytics/compare", params={"jobs": str(jid)}).json()
+    assert cmp["jobs"][0]["items"] == 4 and cmp["jobs"][0]["rates"]["us_vs_them"] == 0.5
@@ -0,0 +1,52 @@
+import json
+import main, models
+
+def _post(client, body, content_type):
+    return client.post("/jobs/batch", content=body, headers={"content-type": content_type})
+
+def test_json_batch_normalizes_and_counts_shared_sources(client, db):
+    rows = [{"name": "a", "podcast_rss": "HTTPS://Feeds.Example.com:443/pod#x"},
+            {"name": "b", "podcast_rss": "feeds.example.com/pod", "priority": 5},
+            {"name": "c", "site_rss": "https://blog.example.org/rss"}]
+    r = _post(client, json.dumps({"jobs": rows}), "application/json")
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["count"], body["sources"]) == (3, 2)
+    assert [j["priority"] for j in body["jobs"]] == [0, 5, 0]
+    jobs = db.query(models.CreatorJob).order_by(models.CreatorJob.id).all()
+    assert [(j.name, j.status, j.podcast_rss) for j in jobs[:2]] == [("a", "queued", "https://feeds.example.com/pod"),
+                                                                    ("b", "queued", "https://feeds.example.com/pod")]
+
+def test_ndjson_and_csv_batches(client, db):
+    ndjson = '{"name": "n1"}\n\n{"name": "n2", "mode": "backfill"}\n'
+    r = _post(client, ndjson, "application/x-ndjson")
+    assert r.status_code == 200 and [j["mode"] for j in r.json()["jobs"]] == ["recent", "backfill"]
+    csv_body = "﻿name,podcast_rss,priority\nc1,https://x.example/feed,2\nc2,,\n"
+    r = _post(client, csv_body.encode("utf-8"), "text/csv")
+    assert r.status_code == 200
+    ids = [j["id"] for j in r.json()["jobs"]]
+    assert [(db.get(models.CreatorJob, i).name, db.get(models.CreatorJob, i).podcast_rss, db.get(models.CreatorJob, i).priority)
+            for i in ids] == [("c1", "https://x.example/feed", 2), ("c2", "", 0)]
+
+def test_invalid_rows_reject_the_whole_batch(client, db):
+    rows = [{"name": "ok"}, {"podcast_rss": "https://x.example/feed"}, {"name": "bad", "mode": "sometimes"}]
+    r = _post(client, json.dumps(rows), "application/json")
+    assert r.status_code == 422
+    assert [e["row"] for e in r.json()["detail"]] == [1, 2]
+    assert db.query(models.CreatorJob).count() == 0
+
+def test_unparseable_empty_and_oversized_batches(client, db, monkeypatch):
+    assert _post(client, "[{", "application/json").status_code == 400
+    assert _post(client, '{"name": "a"}\nnot json\n', "application/x-ndjson").status_code == 400
+    assert _post(client, '{"jobs": "a"}', "application/json").status_code == 400
+    assert _post(client, "[]", "application/json").status_code == 400
+    monkeypatch.setattr(main, "BATCH_MAX", 2)
+    assert _post(client, json.dumps([{"name": str(i)} for i in range(3)]), "application/json").status_code == 413
+    assert db.query(models.CreatorJob).count() == 0
+
+def test_body_that_is_not_utf8_is_400(client, db):
+    # Latin-1 from a spreadsheet export: a client error, not a 500.
+    for content_type in ("text/csv", "application/x-ndjson", "application/json"):
+        r = _post(client, "name\nCaf\xe9 Cr\xe8me\n".encode("latin-1"), content_type)
+        assert r.status_code == 400 and "utf-8" in r.json()["detail"]
+    assert db.query(models.CreatorJob).count() == 0
@@ -0,0 +1,101 @@
+from datetime import date, datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+import feedparser
+import pytest
+from feedstream import iter_entries, entry_date, ParseError, OUT_OF_RANGE_TOLERANCE
+
+START = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+def _entries(n, step_days=3):
+    # Newest first, like real feeds; descriptions padded so a feed spans many chunks.
+    return [{"id": f"id-{i}", "title": f"Episode {i}", "link": f"https://example.com/{i}",
+             "date": START - timedelta(days=step_days * i), "description": f"<p>notes {i} " + "word " * 60 + "</p>"}
+            for i in range(n)]
+
+def rss(n, next_url=None):
+    items = "".join(f"<item><title>{e['title']}</title><link>{e['link']}</link><guid>{e['id']}</guid>"
+                    f"<pubDate>{e['date'].strftime('%a, %d %b %Y %H:%M:%S GMT')}</pubDate>"
+                    f"<description>{escape(e['description'])}</description></item>" for e in _entries(n))
+    nxt = f'<atom:link rel="next" href="{next_url}"/>' if next_url else ""
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">'
+            f"<channel><title>Feed</title><link>https://example.com/</link>{nxt}{items}</channel></rss>").encode()
+
+def atom(n, next_url=None):
+    items = "".join(f"<entry><id>{e['id']}</id><title>{e['title']}</title><link rel=\"alternate\" href=\"{e['link']}\"/>"
+                    f"<published>{e['date'].isoformat()}</published><summary type=\"html\">{escape(e['description'])}</summary>"
+                    "</entry>" for e in _entries(n))
+    nxt = f'<link rel="next" href="{next_url}"/>' if next_url else ""
+    return ('<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f"<title>Feed</title>{nxt}{items}</feed>").encode()
+
+class Chunks:
+    # Byte chunks of a document, counting how many the parser pulled.
+    def __init__(self, body, size=1024):
+        self.body, self.size, self.read = body, size, 0
+
+    def __iter__(self):
+        for i in range(0, len(self.body), self.size):
+            self.read += 1
+            yield self.body[i:i + self.size]
+
+    @property
+    def total(self):
+        return -(-len(self.body) // self.size)
+
+@pytest.mark.parametrize("build", [rss, atom])
+def test_entries_match_feedparser(build):
+    body = build(30)
+    ours = list(iter_entries(Chunks(body)))
+    theirs = feedparser.parse(body).entries
+    assert [(e["title"], e["link"], e["id"]) for e in ours] == [(e.title, e.link, e.id) for e in theirs]
+    assert [entry_date(e) for e in ours] == [date(*e.published_parsed[:3]) for e in theirs]
+
+@pytest.mark.parametrize("build", [rss, atom])
+def test_limit_stops_reading_early(build):
+    chunks = Chunks(build(1000))
+    assert len(list(iter_entries(chunks, limit=5))) == 5
+    assert chunks.read < chunks.total / 50
+
+def test_reads_to_the_end_without_limit():
+    chunks = Chunks(rss(50))
+    assert len(list(iter_entries(chunks))) == 50
+    assert chunks.read == chunks.total
+
+def test_since_stops_after_tolerance():
+    body = rss(400)
+    chunks, since = Chunks(body), date(2025, 3, 1)
+    dates = [entry_date(e) for e in iter_entries(chunks, since=since)]
+    assert dates and all(d >= since for d in dates)
+    assert len(dates) == len([d for d in (entry_date(e) for e in iter_entries(Chunks(body))) if d >= since])
+    assert chunks.read < chunks.total / 2
+
+def test_until_skips_newer_entries_and_reports_an_early_stop():
+    feed = {}
+    since, until = date(2025, 3, 1), date(2025, 5, 1)
+    dates = [entry_date(e) for e in iter_entries(Chunks(rss(400)), since=since, until=until, feed=feed)]
+    assert dates and all(since <= d <= until for d in dates)
+    assert feed["complete"] is False
+    feed = {}
+    list(iter_entries(Chunks(rss(20)), feed=feed))
+    assert feed["complete"] is True
+
+def test_feed_level_links_and_not_entry_links():
+    feed = {}
+    list(iter_entries(Chunks(atom(3, next_url="https://example.com/feed?page=2"), 64), feed=feed))
+    assert feed["links"] == {"next": "https://example.com/feed?page=2"}
+    feed = {}
+    list(iter_entries(Chunks(rss(3, next_url="https://example.com/rss?page=2"), 64), feed=feed))
+    assert feed["links"] == {"next": "https://example.com/rss?page=2"}
+
+def test_out_of_order_entries_within_tolerance_are_kept():
+    # A few old entries in the middle of a newest-first feed do not end the read.
+    items = "".join(f"<item><title>{t}</title><pubDate>{d}</pubDate></item>" for t, d in
+                    [("new", "Sun, 01 Jun 2025 00:00:00 GMT")] +
+                    [(f"old{i}", "Mon, 01 Jan 2018 00:00:00 GMT") for i in range(OUT_OF_RANGE_TOLERANCE - 1)] +
+                    [("newer", "Sat, 31 May 2025 00:00:00 GMT")])
+    body = f"<rss><channel>{items}</channel></rss>".encode()
+    assert [e["title"] for e in iter_entries(Chunks(body, 16), since=date(2025, 1, 1))] == ["new", "newer"]
+
+def test_malformed_xml_raises_parse_error():
+    with pytest.raises(ParseError):
+        list(iter_entries(Chunks(b"<rss><channel><item><title>a &nbsp; b</title></item></channel></rss>")))
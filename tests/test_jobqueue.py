@@ -0,0 +1,139 @@
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update
+import database, models, jobqueue
+
+Job = models.CreatorJob
+
+def _jobs(db, n, **values):
+    jobs = [Job(name=f"job{i}", **values) for i in range(n)]
+    db.add_all(jobs)
+    db.commit()
+    return [j.id for j in jobs]
+
+def test_claim_is_exclusive_across_racing_sessions(db):
+    ids = _jobs(db, 40)
+    barrier, claimed, errors = threading.Barrier(4), {}, []
+
+    def worker(name):
+        session = database.SessionLocal()
+        try:
+            barrier.wait()
+            while True:
+                got = jobqueue.claim(session, name, limit=3)
+                if not got:
+                    break
+                claimed.setdefault(name, []).extend(got)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    won = [jid for got in claimed.values() for jid in got]
+    assert sorted(won) == sorted(ids)  # every job claimed, none twice
+    db.expire_all()
+    owners = dict(db.query(Job.id, Job.worker_id))
+    assert all(owners[jid] == name for name, got in claimed.items() for jid in got)
+
+def test_claim_compare_and_set_loses_to_an_earlier_claim(db):
+    # A claimer that read the job while it was still queued must not take it once another session has.
+    [jid] = _jobs(db, 1)
+    other = database.SessionLocal()
+    try:
+        assert jobqueue.claim(other, "a") == [jid]
+        res = db.execute(update(Job).where(Job.id == jid, jobqueue._claimable(datetime.utcnow())).values(worker_id="b"),
+                         execution_options={"synchronize_session": False})
+        db.commit()
+        assert res.rowcount == 0
+        assert jobqueue.claim(db, "b") == []
+    finally:
+        other.close()
+
+def test_claiming_a_queued_job_keeps_its_enqueue_time(db):
+    [jid] = _jobs(db, 1)
+    enqueued = db.get(Job, jid).enqueued_at
+    assert jobqueue.claim(db, "w") == [jid]
+    job = db.get(Job, jid)
+    db.refresh(job)
+    assert job.enqueued_at == enqueued
+
+def test_expired_lease_is_reclaimed_and_the_old_worker_loses_the_job(db):
+    [jid] = _jobs(db, 1)
+    assert jobqueue.claim(db, "old") == [jid]
+    # Not claimable while the lease holds.
+    assert jobqueue.claim(db, "new") == []
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    db.query(Job).filter_by(id=jid).update({"lease_expires_at": expired})
+    db.commit()
+    assert jobqueue.claim(db, "new") == [jid]
+    job = db.get(Job, jid)
+    db.refresh(job)
+    assert (job.worker_id, job.attempts) == ("new", 2)
+    # Queue wait for the second attempt counts from the expiry, not from the original submit.
+    assert job.enqueued_at == expired
+    # The old worker can neither renew nor complete it any more.
+    jobqueue.renew(db, "old", [jid])
+    assert not jobqueue.complete(db, job, "old")
+    assert jobqueue.complete(db, job, "new")
+    db.refresh(job)
+    assert job.status == "done"
+
+def test_reap_fails_expired_jobs_on_their_final_attempt(db):
+    [jid] = _jobs(db, 1, status="running", worker_id="gone", attempts=jobqueue.MAX_ATTEMPTS,
+                  lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+    assert jobqueue.claim(db, "new") == []
+    jobqueue.reap(db)
+    job = db.get(Job, jid)
+    db.refresh(job)
+    assert (job.status, job.worker_id) == ("error", "")
+
+def test_retry_backs_off_and_requeues(db):
+    [jid] = _jobs(db, 1)
+    assert jobqueue.claim(db, "w") == [jid]
+    job = db.get(Job, jid)
+    jobqueue.fail(db, job, "w", RuntimeError("boom"))
+    db.refresh(job)
+    assert job.status == "queued" and job.next_attempt_at > datetime.utcnow()
+    assert job.enqueued_at == job.next_attempt_at
+    assert jobqueue.claim(db, "w") == []  # still backing off
+
+YT = "https://www.youtube.com/channel/UCshared"
+
+def test_jobs_on_different_feed_hosts_run_in_parallel(db, monkeypatch):
+    # Every job shares the YouTube host; only the feed hosts count toward the per-domain limit.
+    ids = [_jobs(db, 1, yt_channel_url=YT, podcast_rss=f"https://feeds{i}.example.com/rss")[0] for i in range(4)]
+    barrier = threading.Barrier(4, timeout=10)
+
+    def run_job(db, job):
+        barrier.wait()  # breaks (and fails the job) unless all four run at once
+        return []
+
+    import runner
+    monkeypatch.setattr(runner, "run_job", run_job)
+    pool = jobqueue.WorkerPool(concurrency=4)
+    try:
+        assert sorted(pool.drain()) == ids
+    finally:
+        pool.shutdown()
+    assert {j.status for j in db.query(Job).filter(Job.id.in_(ids))} == {"done"}
+
+def test_domain_limit_spreads_jobs_on_one_feed_host(db):
+    busy = _jobs(db, 3, yt_channel_url=YT, podcast_rss="https://feeds.example.com/a")
+    other = _jobs(db, 1, site_rss="https://blog.example.org/feed")
+    assert jobqueue.claim(db, "w", limit=4, domain_limit=2) == busy[:2] + other
+    assert jobqueue.claim(db, "w", limit=4, domain_limit=2) == []
+    assert jobqueue.complete(db, db.get(Job, busy[0]), "w")
+    assert jobqueue.claim(db, "w", limit=4, domain_limit=2) == busy[2:]
+
+def test_blocked_jobs_do_not_hide_claimable_ones(db):
+    # More blocked jobs ahead of it than one page of candidates holds.
+    _jobs(db, 1, status="running", podcast_rss="https://feeds.example.com/a",
+          lease_expires_at=datetime.utcnow() + timedelta(minutes=5))
+    _jobs(db, 120, priority=5, podcast_rss="https://feeds.example.com/a")
+    [free] = _jobs(db, 1, podcast_rss="https://other.example.com/rss")
+    assert jobqueue.claim(db, "w", limit=1, domain_limit=1) == [free]
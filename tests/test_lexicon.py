@@ -0,0 +1,72 @@
+import random, re
+import pytest
+import utils
+
+# Reference: one regex per term with the same boundary rules as utils.Lexicon (start on a word boundary;
+# end on one too unless the category matches by stem), i.e. the pre-Lexicon per-term scan made boundary-aware.
+def _has(t, word, stem=False):
+    return re.search(r"(?<!\w)" + re.escape(word.lower()) + ("" if stem else r"(?!\w)"), t) is not None
+
+def reference_analyze(text):
+    t = (text or "").lower()
+    hits = lambda words, stem=False: [w for w in words if _has(t, w, stem)]
+    return {
+        "sensational_terms": ", ".join(hits(utils.SENSATIONAL)),
+        "loaded_terms": ", ".join(hits(utils.LOADED)),
+        "us_vs_them": bool(hits(utils.US_VS_THEM_TERMS)),
+        "explicit_language": bool(hits(utils.EXPLICIT_TERMS, stem=True)),
+        "clickbait": bool(hits(utils.CLICKBAIT_CUES)),
+        "appeal_authority": bool(hits(utils.APPEAL_AUTHORITY)),
+        "appeal_common_sense": bool(hits(utils.APPEAL_COMMONSENSE)),
+        "appeal_emotion": bool(hits(utils.APPEAL_EMOTION)),
+        "anecdote_as_trend": bool(hits(utils.ANECDOTE_TREND)),
+        "affiliations_found": ", ".join(sorted(set(hits(utils.AFFILIATION_KEYWORDS)))),
+        "ideology_hits": ", ".join(sorted(set(hits(utils.IDEOLOGY_KEYWORDS)))),
+    }
+
+def reference_monetization(text):
+    t = (text or "").lower()
+    return ", ".join(sorted(k for k, words in utils.MONETIZATION_CUES.items() if any(_has(t, w, True) for w in words)))
+
+TERMS = [w for words in (utils.SENSATIONAL, utils.LOADED, utils.US_VS_THEM_TERMS, utils.EXPLICIT_TERMS, utils.CLICKBAIT_CUES,
+                         utils.APPEAL_AUTHORITY, utils.APPEAL_COMMONSENSE, utils.APPEAL_EMOTION, utils.ANECDOTE_TREND,
+                         utils.AFFILIATION_KEYWORDS, utils.IDEOLOGY_KEYWORDS, *utils.MONETIZATION_CUES.values()) for w in words]
+FILLER = ["the", "a", "episode", "re", "s", "ing", "ed", "x", "un", "store", "media", "people", "2024", "-", "'", "…"]
+
+def corpus(n=3000, seed=7):
+    # Terms and their fragments glued to filler with and without separators, in mixed case, so
+    # prefixes, suffixes and overlapping terms all occur.
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 12)):
+            w = rng.choice(TERMS) if rng.random() < 0.6 else rng.choice(FILLER)
+            if rng.random() < 0.2:
+                w = w[:rng.randint(1, len(w))]
+            w = w.upper() if rng.random() < 0.1 else w
+            parts.append(w)
+            parts.append(rng.choice([" ", " ", " ", "", "-", ", ", "'", "! ", "\n"]))
+        out.append("".join(parts))
+    return out
+
+EDGE = ["They're coming", "theyre coming", "restore the shop", "Sponsored by Acme", "use code SAVE", "the elites and them",
+        "conservatives", "conservative", "christian nationalist", "nationalist", "SHOCKING!!!", "it’s common sense",
+        "f*cking", "f**", "NRA-backed", "fearless", "they don't want you to know", "proud boys", "", None]
+
+@pytest.mark.parametrize("text", EDGE)
+def test_edge_cases_match_reference(text):
+    assert utils.analyze_text(text) == reference_analyze(text)
+    assert utils.monetization_signals(text) == reference_monetization(text)
+
+def test_corpus_matches_reference():
+    texts = corpus()
+    assert utils.analyze_many(texts) == [reference_analyze(t) for t in texts]
+    assert [utils.monetization_signals(t) for t in texts] == [reference_monetization(t) for t in texts]
+
+def test_word_boundaries():
+    assert not utils.analyze_text("theyre here")["us_vs_them"]
+    assert utils.analyze_text("they're here")["us_vs_them"]
+    assert utils.monetization_signals("restore factory settings") == ""
+    assert utils.monetization_signals("sponsored by the store") == "merch, sponsor"
+    assert utils.analyze_text("Christian nationalist")["ideology_hits"] == "christian nationalist, nationalist"
@@ -0,0 +1,88 @@
+import json
+import pytest
+from database import bulk_insert
+import analytics, models, reports
+
+@pytest.fixture(autouse=True)
+def fresh_renders(monkeypatch):
+    # Job ids are reused once the db fixture empties the tables, so renders must not outlive a test.
+    monkeypatch.setattr(reports, "RENDERS", reports.RenderCache())
+
+def _job(db, name="rendered", n=2):
+    job = models.CreatorJob(name=name, status="done", timeframe="2024")
+    db.add(job)
+    db.commit()
+    _add(db, job.id, n)
+    reports.save(db, job, {"ai_text": "Summary from the run."})
+    return job.id
+
+def _add(db, job_id, n):
+    bulk_insert(db, models.CollectedItem, [{"job_id": job_id, "platform": "podcast", "title": f"episode {i}",
+                                            "date": "2024-01-01"} for i in range(n)])
+    db.commit()
+
+def test_etag_and_not_modified(client, db):
+    jid = _job(db)
+    r = client.get(f"/reports/{jid}/report.md")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/markdown")
+    assert r.text.startswith("Summary from the run.") and "Auto-collected 2 items" in r.text
+    etag = r.headers["etag"]
+    assert etag == f'"{jid}-1-md-{reports.FINGERPRINT}"'
+    again = client.get(f"/reports/{jid}/report.md", headers={"If-None-Match": f'"stale", {etag}'})
+    assert again.status_code == 304 and again.headers["etag"] == etag and again.content == b""
+    other = client.get(f"/reports/{jid}/report.html", headers={"If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["etag"] != etag
+
+def test_renders_are_cached_per_version(db):
+    jid = _job(db)
+    hits = reports.RENDERS.hits
+    first = reports.render(db, jid, "json")
+    assert reports.render(db, jid, "json") == first
+    assert reports.RENDERS.hits == hits + 1
+    assert json.loads(first[0])["total"] == 2
+
+def test_version_bump_invalidates_the_render(client, db):
+    jid = _job(db)
+    before = client.get(f"/reports/{jid}/report.md")
+    _add(db, jid, 3)
+    analytics.refresh(db, jid, ["2024-01"])
+    reports.bump_version(db, jid)
+    db.commit()
+    after = client.get(f"/reports/{jid}/report.md", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200 and after.headers["etag"] == f'"{jid}-2-md-{reports.FINGERPRINT}"'
+    assert "Auto-collected 5 items" in after.text
+    reports.save(db, db.get(models.CreatorJob, jid), {"ai_text": "A newer summary."})
+    latest = client.get(f"/reports/{jid}/report.md")
+    assert latest.headers["etag"].startswith(f'"{jid}-3-') and latest.text.startswith("A newer summary.")
+
+def test_html_is_escaped(client, db):
+    jid = _job(db, name="<script>alert(1)</script>")
+    body = client.get(f"/reports/{jid}/report.html").text
+    assert "<script>alert" not in body and "&lt;script&gt;" in body
+
+def test_missing_reports_and_formats(client, db):
+    jid = _job(db)
+    assert client.get(f"/reports/{jid}/report.pdf").status_code == 404
+    assert client.get("/reports/999999/report.md").status_code == 404
+    job = models.CreatorJob(name="unrun", status="queued")
+    db.add(job)
+    db.commit()
+    assert client.get(f"/reports/{job.id}/report.md").status_code == 404
+    assert client.get(f"/reports/{job.id}").json()["report_markdown"] == ""
+
+def test_render_cache_is_bounded():
+    cache = reports.RenderCache(max_entries=2, max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    cache.get("a")
+    cache.put("c", "1")
+    assert set(cache.entries) == {"a", "c"} and cache.size == 6
+    cache.put("d", "x" * 10)
+    assert list(cache.entries) == ["d"] and cache.size == 10
+
+def test_run_stores_the_markdown_for_summary_excerpts(client, db):
+    jid = _job(db)
+    stored = db.query(models.JobReport).filter_by(job_id=jid).one().report_markdown
+    assert stored == client.get(f"/reports/{jid}/report.md").text
+    [row] = client.get("/jobs/summary", params={"excerpt": 21}).json()["jobs"]
+    assert row["report_excerpt"] == "Summary from the run."
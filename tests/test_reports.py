@@ -0,0 +1,42 @@
+import json
+from database import bulk_insert
+import models, schemas
+
+def _job_with_items(db, n):
+    job = models.CreatorJob(name="paged", status="done")
+    db.add(job)
+    db.commit()
+    bulk_insert(db, models.CollectedItem, [{"job_id": job.id, "title": f"t{i}", "date": f"2024-01-{i % 28 + 1:02d}",
+                                            "description": "d" * 50, "us_vs_them": i % 2 == 0} for i in range(n)])
+    db.commit()
+    return job.id
+
+def test_pages_cover_every_item_once(client, db):
+    jid = _job_with_items(db, 2500)
+    seen, after, pages = [], 0, 0
+    while after is not None:
+        body = client.get(f"/reports/{jid}", params={"limit": 1000, "after": after}).json()
+        seen += [it["id"] for it in body["items"]]
+        after, pages = body.get("next_after"), pages + 1
+    assert pages == 3
+    assert len(seen) == 2500 and seen == sorted(set(seen))
+
+def test_default_fields_and_projection(client, db):
+    jid = _job_with_items(db, 3)
+    default = client.get(f"/reports/{jid}").json()["items"][0]
+    assert set(default) == set(schemas.ITEM_DEFAULT_FIELDS)
+    projected = client.get(f"/reports/{jid}", params={"fields": "id,title,us_vs_them"}).json()["items"]
+    assert projected == [{"id": projected[0]["id"] + i, "title": f"t{i}", "us_vs_them": i % 2 == 0} for i in range(3)]
+    assert client.get(f"/reports/{jid}", params={"fields": "title,password"}).status_code == 400
+
+def test_ndjson_export_streams_every_item(client, db):
+    jid = _job_with_items(db, 2100)
+    r = client.get(f"/reports/{jid}/items.ndjson", params={"fields": "id,title"})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert len(rows) == 2100 and set(rows[0]) == {"id", "title"}
+    assert [row["title"] for row in rows] == [f"t{i}" for i in range(2100)]
+
+def test_unknown_job_is_404(client, db):
+    assert client.get("/reports/999999").status_code == 404
+    assert client.get("/reports/999999/items.ndjson").status_code == 404
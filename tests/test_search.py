@@ -0,0 +1,78 @@
+import pytest
+from database import bulk_insert
+import models, search
+
+ROWS = [("Bombshell report on the elites", "", "2024-03-01", True),
+        ("Weekly news", "a bombshell in the notes", "2024-05-01", False),
+        ("Bombastic guest", "", "2023-12-31", True),
+        ("Mainstream media meltdown", "they said so", "2024-07-04", True),
+        ("Quiet episode", "nothing to see", "", False)]
+
+@pytest.fixture
+def items(db):
+    job = models.CreatorJob(name="searchable", status="done")
+    db.add(job)
+    db.commit()
+    bulk_insert(db, models.CollectedItem, [{"job_id": job.id, "title": t, "description": d, "date": day, "us_vs_them": us,
+                                            "platform": "podcast"} for t, d, day, us in ROWS])
+    db.commit()
+    return job.id
+
+@pytest.fixture(params=["fts", "like"])
+def backend(request, db, monkeypatch):
+    # The same queries through the FTS5 index and through the LIKE fallback used where FTS is unavailable.
+    if request.param == "like":
+        monkeypatch.setitem(search._fts_ready, db.get_bind().url, False)
+    return request.param
+
+def _titles(client, **params):
+    r = client.get("/items/search", params={"fields": "title", **params})
+    assert r.status_code == 200, r.text
+    return sorted(it["title"] for it in r.json()["items"])
+
+def test_terms_phrases_and_prefixes(client, items, backend):
+    assert _titles(client, q="bombshell") == ["Bombshell report on the elites", "Weekly news"]
+    assert _titles(client, q='"mainstream media"') == ["Mainstream media meltdown"]
+    assert _titles(client, q="bombshell elites") == ["Bombshell report on the elites"]
+    assert _titles(client, q="bomb*") == ["Bombastic guest", "Bombshell report on the elites", "Weekly news"]
+    assert _titles(client, q="nonexistent") == []
+
+def test_flags_dates_and_hits_carry_the_creator(client, items, backend):
+    assert _titles(client, q="bombshell", flags="us_vs_them") == ["Bombshell report on the elites"]
+    assert _titles(client, flags="us_vs_them", since="2024-01-01", until="2024-06-30") == ["Bombshell report on the elites"]
+    hit = client.get("/items/search", params={"q": "meltdown"}).json()["items"][0]
+    assert (hit["job_id"], hit["creator"]) == (items, "searchable")
+
+def test_query_syntax_is_never_interpreted(client, items, backend):
+    # FTS5 operators and punctuation are searched as text, not parsed.
+    for q in ['NEAR(a b)', 'title:bombshell', '"', '***', 'a OR', '-']:
+        assert client.get("/items/search", params={"q": q}).status_code == 200
+
+def test_newest_first_keyset_paging(client, items):
+    first = client.get("/items/search", params={"limit": 2}).json()
+    rest = client.get("/items/search", params={"limit": 10, "before": first["next_before"]}).json()
+    ids = [it["id"] for it in first["items"] + rest["items"]]
+    assert ids == sorted(ids, reverse=True) and len(ids) == len(ROWS)
+
+def test_index_follows_updates_and_deletes(client, db, items):
+    item = db.query(models.CollectedItem).filter_by(title="Quiet episode").one()
+    item.title = "Loud bombshell episode"
+    db.commit()
+    assert "Loud bombshell episode" in _titles(client, q="bombshell")
+    db.delete(item)
+    db.commit()
+    assert "Loud bombshell episode" not in _titles(client, q="bombshell")
+
+def test_unknown_flag_is_400(client, items):
+    assert client.get("/items/search", params={"flags": "clickbait,bogus"}).status_code == 400
+
+def test_like_fallback_matches_wildcards_literally(client, db, monkeypatch):
+    monkeypatch.setitem(search._fts_ready, db.get_bind().url, False)
+    job = models.CreatorJob(name="literal", status="done")
+    db.add(job)
+    db.commit()
+    bulk_insert(db, models.CollectedItem, [{"job_id": job.id, "title": t, "description": ""}
+                                           for t in ["100% honest", "1000 reasons", "snake_case talk", "snakescase"]])
+    db.commit()
+    assert _titles(client, q="100%") == ["100% honest"]
+    assert _titles(client, q="snake_case") == ["snake_case talk"]
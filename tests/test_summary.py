@@ -0,0 +1,40 @@
+from database import bulk_insert
+import models
+
+def _job(db, name, flags=(), report=None):
+    job = models.CreatorJob(name=name, status="done")
+    db.add(job)
+    db.commit()
+    bulk_insert(db, models.CollectedItem, [{"job_id": job.id, "title": f"{name}{i}", "us_vs_them": f["us"],
+                                            "sensational_terms": f["sens"], "monetization": "", "explicit_language": False}
+                                           for i, f in enumerate(flags)])
+    if report is not None:
+        db.add(models.JobReport(job_id=job.id, report_markdown=report))
+    db.commit()
+    return job.id
+
+def test_rates_counts_and_excerpt(client, db):
+    jid = _job(db, "a", [{"us": True, "sens": "shocking"}, {"us": True, "sens": ""}, {"us": False, "sens": ""},
+                         {"us": False, "sens": ""}], report="Overview\n" + "x" * 500)
+    empty = _job(db, "b")
+    jobs = {j["id"]: j for j in client.get("/jobs/summary", params={"excerpt": 20}).json()["jobs"]}
+    a = jobs[jid]
+    assert (a["item_count"], a["us_them_rate"], a["sensational_rate"], a["monetized_rate"]) == (4, 0.5, 0.25, 0.0)
+    assert a["report_excerpt"] == ("Overview\n" + "x" * 500)[:20]
+    # No items and no report yet: zero counts and an empty excerpt rather than nulls.
+    assert (jobs[empty]["item_count"], jobs[empty]["us_them_rate"], jobs[empty]["report_excerpt"]) == (0, 0.0, "")
+
+def test_keyset_pages_newest_first(client, db):
+    ids = [_job(db, f"j{i}") for i in range(5)]
+    first = client.get("/jobs/summary", params={"limit": 3}).json()
+    assert [j["id"] for j in first["jobs"]] == ids[::-1][:3]
+    second = client.get("/jobs/summary", params={"limit": 3, "before": first["next_before"]}).json()
+    assert [j["id"] for j in second["jobs"]] == ids[::-1][3:]
+    assert second["next_before"] is None
+
+def test_rows_carry_the_job_priority(client, db):
+    jid = _job(db, "urgent")
+    db.get(models.CreatorJob, jid).priority = 7
+    db.commit()
+    [row] = client.get("/jobs/summary").json()["jobs"]
+    assert row["priority"] == 7
@@ -0,0 +1,46 @@
+from datetime import date
+import pytest
+from utils import parse_timeframe
+
+TODAY = date(2026, 10, 18)
+
+@pytest.mark.parametrize("text, expected", [
+    # The form jobs default to, with an en dash, em dash, hyphen or spaced separators.
+    ("2020–present", (date(2020, 1, 1), None)),
+    ("2020—present", (date(2020, 1, 1), None)),
+    ("2020-present", (date(2020, 1, 1), None)),
+    ("  2020–present  ", (date(2020, 1, 1), None)),
+    ("2020 - now", (date(2020, 1, 1), None)),
+    ("2022-today", (date(2022, 1, 1), None)),
+    # Year ranges and single years cover whole years.
+    ("2019-2022", (date(2019, 1, 1), date(2022, 12, 31))),
+    ("2019 — 2022", (date(2019, 1, 1), date(2022, 12, 31))),
+    ("2021", (date(2021, 1, 1), date(2021, 12, 31))),
+    # A month without a day runs to the end of that month, leap years included.
+    ("Mar 2021 to Jun 2023", (date(2021, 3, 1), date(2023, 6, 30))),
+    ("Feb 2024", (date(2024, 2, 1), date(2024, 2, 29))),
+    ("Feb 2023 - Feb 2024", (date(2023, 2, 1), date(2024, 2, 29))),
+    ("2023-12", (date(2023, 12, 1), date(2023, 12, 31))),
+    # Exact dates stay exact.
+    ("2021-06-15", (date(2021, 6, 15), date(2021, 6, 15))),
+    ("2021-06-15 to 2021-07-01", (date(2021, 6, 15), date(2021, 7, 1))),
+    # Open-ended and relative forms.
+    ("since 2018", (date(2018, 1, 1), None)),
+    ("from March 2020", (date(2020, 3, 1), None)),
+    ("since 2021-03-05", (date(2021, 3, 5), None)),
+    ("last 3 years", (date(2023, 10, 19), None)),
+    ("LAST 1 YEAR", (date(2025, 10, 18), None)),
+    ("past 2 weeks", (date(2026, 10, 4), None)),
+    # No bounds at all.
+    ("", (None, None)),
+    (None, (None, None)),
+    ("all time", (None, None)),
+    ("full history", (None, None)),
+])
+def test_parse_timeframe(text, expected):
+    assert parse_timeframe(text, TODAY) == expected
+
+@pytest.mark.parametrize("text", ["gibberish", "2019 to 2020 to 2021", "since whenever", "last few years"])
+def test_unreadable_timeframes_raise(text):
+    with pytest.raises(ValueError):
+        parse_timeframe(text, TODAY)
@@ -1,7 +1,12 @@
-import feedparser, datetime, os, requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
-from dateutil import parser as dateparser
+import calendar, datetime, hashlib, json, os, re, time
+from urllib.parse import urlparse, urljoin
+from cache import FEED_CACHE, RESULT_CACHE, FEED_FLIGHTS
+from http_client import HTTP, openai_client, YOUTUBE_API_BASE, YOUTUBE_FEED_BASE, SERPAPI_BASE
+from metrics import stage, observe
+from feedstream import iter_entries, entry_date, ParseError
+
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(7 * 86400)))
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(30 * 86400)))
 
 SENSATIONAL = ["exposed","destroyed","shocking","insane","collapse","apocalypse","secret","they don't want you to know","ultimate","never seen","breaking","must see","bombshell","meltdown","obliterates","epic","unbelievable"]
 LOADED = ["idiot","thug","degenerate","terrorist","traitor","groomer","commie","fascist","lunatic","clown","cuck","sheeple"]
@@ -14,24 +19,236 @@ ANECDOTE_TREND = ["everyone is","people are saying","goes viral","trend proves"]
 
 AFFILIATION_KEYWORDS = ["NRA","Turning Point USA","PragerU","Daily Wire","Blaze Media","Heritage Foundation","Project Veritas","Moms for Liberty","GOP","RNC","DNC","Antifa","Black Lives Matter","Proud Boys","Oath Keepers","Sierra Club","ACLU","Human Rights Campaign","NARAL","Susan B. Anthony List","ALEC"]
 IDEOLOGY_KEYWORDS = ["libertarian","socialist","marxist","communist","anarchist","conservative","progressive","nationalist","populist","christian nationalist","theocratic","secular","feminist","traditionalist"]
+EXPLICIT_TERMS = ["f**","f*ck","fuck","shit","bitch","asshole"]
+MONETIZATION_CUES = {
+    "sponsor": ["sponsor","sponsored by","paid partnership"],
+    "promo code": ["promo code","use code","my code"],
+    "affiliate": ["affiliate","ref link","referral"],
+    "donations/membership": ["patreon","substack","buymeacoffee","locals.com","membership"],
+    "merch": ["merch","store","shop","teespring"],
+}
+
+class Lexicon:
+    # Every term of every category compiled into one trie-shaped regex, so a scan costs one pass over
+    # the text regardless of how many terms there are. Terms must start on a word boundary ("restore"
+    # is not "store") and end on one too ("theyre" is not "they") unless their category is matched by
+    # stem ("sponsored" counts as "sponsor").
+    def __init__(self, categories, stems=()):
+        self.categories = categories
+        self.rank, self.stem, trie = {}, {}, {}
+        for cat, words in categories.items():
+            for i, w in enumerate(words):
+                t = w.lower()
+                self.rank.setdefault(t, {})[cat] = (i, w)
+                self.stem[t] = self.stem.get(t, True) and cat in stems
+        for t in self.rank:
+            node = trie
+            for ch in t:
+                node = node.setdefault(ch, {})
+            node[""] = "" if self.stem[t] else r"(?!\w)"
+        # A match only reports the longest term at a position; shorter terms it starts with are recovered here.
+        self.prefixes = {t: [p for p in self.rank if p != t and t.startswith(p)] for t in self.rank}
+        self.pattern = re.compile(r"(?<!\w)(?=(" + self._trie_pattern(trie) + "))")
+        self.word = re.compile(r"\w")
+
+    def _trie_pattern(self, node):
+        alts = [re.escape(ch) + self._trie_pattern(sub) for ch, sub in sorted(node.items()) if ch]
+        if "" in node:
+            alts.append(node[""])
+        return alts[0] if len(alts) == 1 and "" not in node else "(?:" + "|".join(alts) + ")"
+
+    def scan(self, text):
+        t = (text or "").lower()
+        found = set()
+        for m in self.pattern.finditer(t):
+            term = m.group(1)
+            found.add(term)
+            for p in self.prefixes[term]:
+                end = m.start() + len(p)
+                if self.stem[p] or end == len(t) or not self.word.match(t, end):
+                    found.add(p)
+        hits = {cat: [] for cat in self.categories}
+        for term in found:
+            for cat, ranked in self.rank[term].items():
+                hits[cat].append(ranked)
+        return {cat: [w for _, w in sorted(v)] for cat, v in hits.items()}
+
+LEXICON = Lexicon({
+    "sensational": SENSATIONAL, "loaded": LOADED, "us_vs_them": US_VS_THEM_TERMS, "explicit": EXPLICIT_TERMS,
+    "clickbait": CLICKBAIT_CUES, "appeal_authority": APPEAL_AUTHORITY, "appeal_common_sense": APPEAL_COMMONSENSE,
+    "appeal_emotion": APPEAL_EMOTION, "anecdote": ANECDOTE_TREND, "affiliations": AFFILIATION_KEYWORDS,
+    "ideologies": IDEOLOGY_KEYWORDS,
+}, stems={"explicit"})
+MONETIZATION_LEXICON = Lexicon(MONETIZATION_CUES, stems=set(MONETIZATION_CUES))
+
+STREAM_CHUNK = 64 * 1024
+# Safety bound on RFC 5005 paging; a feed that links to itself forever must still end.
+HISTORY_MAX_PAGES = int(os.getenv("HISTORY_MAX_PAGES", "500"))
+
+def _chunks(r, counts):
+    for chunk in r.iter_content(STREAM_CHUNK):
+        counts["bytes"] = counts.get("bytes", 0) + len(chunk)
+        yield chunk
+
+def parse_generic_rss(rss_url, limit=30, timeout=30, since=None):
+    # Jobs running at the same time that share a feed fetch and parse it once; each gets its own
+    # copies of the items because runner tags them in place.
+    items = FEED_FLIGHTS.do((rss_url, limit, since), lambda: _fetch_feed(rss_url, limit, timeout, since))
+    return [dict(it) for it in items]
+
+def _fetch_feed(rss_url, limit, timeout, since):
+    import feedparser  # heavy; imported on first use so importing utils stays cheap
+    if urlparse(rss_url).scheme not in ("http", "https"):
+        return _feed_items(feedparser.parse(rss_url).entries, rss_url, limit, since)
+    # Only limit-bounded reads are cached; a since= cutoff yields a different slice of the feed.
+    cached = FEED_CACHE.get(rss_url, limit) if since is None else None
+    if cached and cached["fresh"]:
+        return cached["items"]
+    provider = f"feed:{urlparse(rss_url).netloc}"
+    headers = {"User-Agent": feedparser.USER_AGENT, **(cached["headers"] if cached else {})}
+    r = HTTP.get(provider, rss_url, timeout=timeout, headers=headers, stream=True)
+    try:
+        if r.status_code == 304 and cached:
+            FEED_CACHE.touch(rss_url, revalidated=True)
+            return cached["items"]
+        r.raise_for_status()
+        with stage("download", source=provider) as counts:
+            try:
+                items = _feed_items(iter_entries(_chunks(r, counts), limit, since), rss_url, limit, since)
+            except ParseError:
+                # Malformed XML (undeclared HTML entities and the like): refetch for feedparser's lenient parser.
+                r.close()
+                r, d = _lenient_fetch(provider, rss_url, timeout, counts)
+                items = _feed_items(d.entries, rss_url, limit, since)
+            counts["items"] = len(items)
+    finally:
+        # Stopping at the limit leaves the body unread, which costs this connection its keep-alive.
+        r.close()
+    if since is None:
+        FEED_CACHE.put(rss_url, items, limit, etag=r.headers.get("ETag", ""), last_modified=r.headers.get("Last-Modified", ""))
+    return items
+
+def _lenient_fetch(provider, url, timeout, counts):
+    import feedparser
+    r = HTTP.get(provider, url, timeout=timeout, headers={"User-Agent": feedparser.USER_AGENT})
+    r.raise_for_status()
+    counts["bytes"] = counts.get("bytes", 0) + len(r.content)
+    return r, feedparser.parse(r.content, response_headers={k.lower(): v for k, v in r.headers.items()})
 
-def parse_generic_rss(rss_url, limit=30):
-    d = feedparser.parse(rss_url)
+def _in_range(d, since, until):
+    return d is None or ((since is None or d >= since) and (until is None or d <= until))
+
+def _feed_item(e, rss_url, d):
+    return {"date": d.isoformat() if d else "", "title": (e.get("title","") or "").strip(),
+            "url": e.get("link",""), "guid": e.get("id", ""),
+            "platform": urlparse(rss_url).netloc, "description": Beautifulsoup_safe(e.get("summary", ""))}
+
+def _feed_items(entries, rss_url, limit, since=None):
     items = []
-    for e in d.entries[:limit]:
-        title = e.get("title","").strip()
-        link = e.get("link","")
-        published = e.get("published","") or e.get("updated","") or ""
-        try:
-            dt = dateparser.parse(published).date().isoformat() if published else ""
-        except Exception:
-            dt = ""
-        summary = Beautifulsoup_safe(e.get("summary", ""))
-        items.append({"date": dt, "title": title, "url": link,
-                      "platform": urlparse(rss_url).netloc, "description": summary})
+    for e in entries:
+        if len(items) >= limit:
+            break
+        d = entry_date(e)
+        if _in_range(d, since, None):
+            items.append(_feed_item(e, rss_url, d))
     return items
 
+def iter_feed_history(rss_url, since=None, until=None, timeout=30, page_url=None):
+    # Full history of a feed within [since, until]: every entry of the document, then the RFC 5005
+    # rel="next" pages (archives, paged WordPress feeds), streamed one entry at a time. Yields
+    # (page_url, item); a caller that stored everything up to an item can resume from its page_url.
+    import feedparser
+    if urlparse(rss_url).scheme not in ("http", "https"):
+        for e in feedparser.parse(rss_url).entries:
+            d = entry_date(e)
+            if _in_range(d, since, until):
+                yield rss_url, _feed_item(e, rss_url, d)
+        return
+    provider = f"feed:{urlparse(rss_url).netloc}"
+    url, seen = page_url or rss_url, set()
+    while url and url not in seen and len(seen) < HISTORY_MAX_PAGES:
+        seen.add(url)
+        feed, counts, busy = {}, {"items": 0}, 0.0
+        r = HTTP.get(provider, url, timeout=timeout, headers={"User-Agent": feedparser.USER_AGENT}, stream=True)
+        try:
+            r.raise_for_status()
+            entries = iter_entries(_chunks(r, counts), since=since, until=until, feed=feed)
+            while True:
+                # Only time spent reading and parsing counts as download; the caller's work between items does not.
+                t0 = time.perf_counter()
+                try:
+                    e = next(entries, None)
+                except ParseError:
+                    # Entries already yielded from this page come round again; callers dedupe by item key.
+                    r.close()
+                    r, d = _lenient_fetch(provider, url, timeout, counts)
+                    links = {l.get("rel"): l.get("href") for l in d.feed.get("links", []) if l.get("href")}
+                    feed = {"links": links, "complete": True}
+                    entries = iter(e for e in d.entries if _in_range(entry_date(e), since, until))
+                    continue
+                finally:
+                    busy += time.perf_counter() - t0
+                if e is None:
+                    break
+                counts["items"] += 1
+                yield url, _feed_item(e, rss_url, entry_date(e))
+        finally:
+            r.close()
+            observe("download", busy, provider, counts["items"], counts.get("bytes", 0))
+        if not feed.get("complete", True):
+            return  # reached entries older than `since`; older pages are out of range too
+        nxt = feed.get("links", {}).get("next")
+        url = urljoin(url, nxt) if nxt else None
+
+def parse_timeframe(text, today=None):
+    # "2020–present", "2019-2022", "2021", "Mar 2021 to Jun 2023", "since 2018", "last 3 years" ->
+    # (since, until) dates, None meaning unbounded. Raises ValueError for text it cannot read.
+    today = today or datetime.date.today()
+    t = (text or "").strip().lower().replace("\u2013", "-").replace("\u2014", "-")
+    if t in ("", "all", "all time", "full history", "everything"):
+        return None, None
+    m = re.fullmatch(r"(?:last|past)\s+(\d+)\s+(day|week|month|year)s?", t)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        days = {"day": 1, "week": 7, "month": 30, "year": 365}[unit] * n
+        return today - datetime.timedelta(days=days), None
+    m = re.fullmatch(r"(?:since|from|after)\s+(.+)", t)
+    if m:
+        return _timeframe_bound(m.group(1), start=True), None
+    parts = re.split(r"\s+(?:-|to|until|through)\s+|(?<=\d{4})-(?=\d{4}$)|(?<=[a-z\d])-(?=present|now|today)", t)
+    if len(parts) == 1:
+        return _timeframe_bound(t, start=True), _timeframe_bound(t, start=False)
+    if len(parts) != 2:
+        raise ValueError(f"unrecognised timeframe: {text!r}")
+    return _timeframe_bound(parts[0], start=True), _timeframe_bound(parts[1], start=False)
+
+def _timeframe_bound(part, start):
+    part = part.strip()
+    if part in ("present", "now", "today", ""):
+        return None
+    if re.fullmatch(r"\d{4}", part):
+        return datetime.date(int(part), 1, 1) if start else datetime.date(int(part), 12, 31)
+    from dateutil import parser as dateparser
+    try:
+        first = dateparser.parse(part, default=datetime.datetime(2000, 1, 1)).date()
+        late = dateparser.parse(part, default=datetime.datetime(2000, 1, 28)).date()
+    except (ValueError, OverflowError):
+        raise ValueError(f"unrecognised timeframe: {part!r}")
+    if start or first == late:
+        return first
+    # A month without a day ("Jun 2023") runs to the end of that month.
+    return first.replace(day=calendar.monthrange(first.year, first.month)[1])
+
+def item_key(platform, it):
+    ident = it.get("guid") or it.get("url") or (it.get("title","") + "|" + it.get("date",""))
+    return hashlib.sha1(f"{platform}\n{ident}".encode("utf-8")).hexdigest()
+
+def content_hash(it):
+    body = "\n".join(it.get(k, "") or "" for k in ("date", "title", "url", "description"))
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
 def Beautifulsoup_safe(html):
+    from bs4 import BeautifulSoup
     try:
         return BeautifulSoup(html, "html.parser").get_text(" ", strip=True)
     except Exception:
@@ -45,44 +262,30 @@ def yt_channel_id_from_url(url: str) -> str:
     return ""
 
 def yt_rss_from_channel_id(cid: str) -> str:
-    return f"https://www.youtube.com/feeds/videos.xml?channel_id={cid}"
+    return f"{YOUTUBE_FEED_BASE}/videos.xml?channel_id={cid}"
 
 def analyze_text(text: str):
-    t = (text or "").lower()
-    sensational_hits = [w for w in SENSATIONAL if w in t]
-    loaded_hits = [w for w in LOADED if w in t]
-    us_them = any(w in t for w in US_VS_THEM_TERMS)
-    explicit = any(x in t for x in ["f**","f*ck","fuck","shit","bitch","asshole"])
-    clickbait = any(w in t for w in CLICKBAIT_CUES)
-    appeal_auth = any(w in t for w in APPEAL_AUTHORITY)
-    appeal_common = any(w in t for w in APPEAL_COMMONSENSE)
-    appeal_emotion = any(w in t for w in APPEAL_EMOTION)
-    anecdote = any(w in t for w in ANECDOTE_TREND)
-    affiliations = [w for w in AFFILIATION_KEYWORDS if w.lower() in t]
-    ideologies = [w for w in IDEOLOGY_KEYWORDS if w in t]
+    hits = LEXICON.scan(text)
     return {
-        "sensational_terms": ", ".join(sensational_hits),
-        "loaded_terms": ", ".join(loaded_hits),
-        "us_vs_them": us_them,
-        "explicit_language": explicit,
-        "clickbait": clickbait,
-        "appeal_authority": appeal_auth,
-        "appeal_common_sense": appeal_common,
-        "appeal_emotion": appeal_emotion,
-        "anecdote_as_trend": anecdote,
-        "affiliations_found": ", ".join(sorted(set(affiliations))),
-        "ideology_hits": ", ".join(sorted(set(ideologies)))
+        "sensational_terms": ", ".join(hits["sensational"]),
+        "loaded_terms": ", ".join(hits["loaded"]),
+        "us_vs_them": bool(hits["us_vs_them"]),
+        "explicit_language": bool(hits["explicit"]),
+        "clickbait": bool(hits["clickbait"]),
+        "appeal_authority": bool(hits["appeal_authority"]),
+        "appeal_common_sense": bool(hits["appeal_common_sense"]),
+        "appeal_emotion": bool(hits["appeal_emotion"]),
+        "anecdote_as_trend": bool(hits["anecdote"]),
+        "affiliations_found": ", ".join(sorted(set(hits["affiliations"]))),
+        "ideology_hits": ", ".join(sorted(set(hits["ideologies"])))
     }
 
+def analyze_many(texts):
+    return [analyze_text(t) for t in texts]
+
 def monetization_signals(text: str):
-    t = (text or "").lower()
-    hits = []
-    if any(k in t for k in ["sponsor","sponsored by","paid partnership"]): hits.append("sponsor")
-    if any(k in t for k in ["promo code","use code","my code"]): hits.append("promo code")
-    if any(k in t for k in ["affiliate","ref link","referral"]): hits.append("affiliate")
-    if any(k in t for k in ["patreon","substack","buymeacoffee","locals.com","membership"]): hits.append("donations/membership")
-    if any(k in t for k in ["merch","store","shop","teespring"]): hits.append("merch")
-    return ", ".join(sorted(set(hits)))
+    hits = MONETIZATION_LEXICON.scan(text)
+    return ", ".join(sorted(k for k, v in hits.items() if v))
 
 def build_chicago_note(url: str, title: str, access_date: str):
     host = urlparse(url).netloc
@@ -92,8 +295,8 @@ def today_iso(): return datetime.date.today().isoformat()
 
 def fetch_youtube_channel_stats(channel_id: str, api_key: str):
     try:
-        url = f"https://www.googleapis.com/youtube/v3/channels?part=statistics&id={channel_id}&key={api_key}"
-        r = requests.get(url, timeout=15)
+        r = HTTP.get("youtube", f"{YOUTUBE_API_BASE}/channels", timeout=15,
+                     params={"part": "statistics", "id": channel_id, "key": api_key})
         js = r.json()
         items = js.get("items", [])
         if not items: return {}
@@ -106,16 +309,20 @@ def fetch_youtube_channel_stats(channel_id: str, api_key: str):
     except Exception:
         return {}
 
-def search_reception_queries(name: str, serp_key: str, num=5):
+def search_reception_queries(name: str, serp_key: str, num=5, bypass_cache=False):
     try:
-        from serpapi import GoogleSearch
         qs = [f"{name} controversy site:news", f"{name} fact check", f"{name} criticism", f"{name} praise review"]
         out = []
         for q in qs:
-            search = GoogleSearch({"q": q, "api_key": serp_key, "num": num})
-            res = search.get_dict()
-            for r in res.get("organic_results", [])[:num]:
-                url = r.get("link"); title = r.get("title")
+            params = {"q": q, "num": num}
+            hit, results = RESULT_CACHE.get("serpapi", params, bypass=bypass_cache)
+            if not hit:
+                res = HTTP.get("serpapi", f"{SERPAPI_BASE}/search.json", timeout=30,
+                               params={"engine": "google", **params, "api_key": serp_key}).json()
+                results = [[r.get("title"), r.get("link")] for r in res.get("organic_results", [])[:num]]
+                if results and "error" not in res:
+                    RESULT_CACHE.put("serpapi", params, results, SEARCH_CACHE_TTL)
+            for title, url in results:
                 if url and title:
                     out.append((title, url))
         seen, uniq = set(), []
@@ -126,10 +333,11 @@ def search_reception_queries(name: str, serp_key: str, num=5):
     except Exception:
         return []
 
-def ai_sections(name, timeframe, items, affiliations_all, ideology_all, reach, controversies, openai_key):
+def _approx(n):
+    return int(float(f"{n:.2g}")) if isinstance(n, (int, float)) else n
+
+def ai_sections(name, timeframe, items, affiliations_all, ideology_all, reach, controversies, openai_key, bypass_cache=False):
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=openai_key)
         sample = items[:25]
         ctx = [{"title": it.get("title"), "date": it.get("date"), "desc": it.get("description"),
                 "flags": {k: it.get(k) for k in ["sensational_terms","loaded_terms","us_vs_them","explicit_language","clickbait","appeal_authority","appeal_common_sense","appeal_emotion","anecdote_as_trend","monetization"]}} for it in sample]
@@ -138,7 +346,8 @@ def ai_sections(name, timeframe, items, affiliations_all, ideology_all, reach, c
             "timeframe": timeframe,
             "affiliations": sorted(list(affiliations_all)),
             "ideologies": sorted(list(ideology_all)),
-            "reach": reach,
+            # Two significant figures: live counts change daily and would otherwise miss the result cache.
+            "reach": {k: _approx(v) for k, v in (reach or {}).items()},
             "controversies": controversies,
             "items_sample": ctx,
             "format_order": [
@@ -151,12 +360,18 @@ def ai_sections(name, timeframe, items, affiliations_all, ideology_all, reach, c
         }
         sys = "You draft non-partisan media profiles in clear language for parents, grounded in evidence."
         user = json.dumps(prompt)
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role":"system","content":sys},{"role":"user","content":user}],
-            temperature=0.2,
-            max_tokens=1400,
-        )
-        return resp.choices[0].message.content
+        request = {"model": "gpt-4o-mini", "messages": [{"role":"system","content":sys},{"role":"user","content":user}],
+                   "temperature": 0.2, "max_tokens": 1400}
+        hit, text = RESULT_CACHE.get("openai", request, bypass=bypass_cache)
+        if hit:
+            return text
+        HTTP.throttle("openai")
+        HTTP.count("openai", "requests")
+        with stage("api", source="openai"):
+            resp = openai_client(openai_key).chat.completions.create(**request)
+        text = resp.choices[0].message.content
+        if text:
+            RESULT_CACHE.put("openai", request, text, AI_CACHE_TTL)
+        return text
     except Exception:
         return ""
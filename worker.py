@@ -0,0 +1,37 @@
+import argparse, logging, signal, threading
+from database import migrate
+import jobqueue
+from jobqueue import WorkerPool
+
+def process_queue(concurrency=jobqueue.CONCURRENCY):
+    # Run the queue to completion in this process and return the processed job ids.
+    pool = WorkerPool(concurrency=concurrency)
+    try:
+        return pool.drain()
+    finally:
+        pool.shutdown()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m worker", description="Process queued creator jobs.")
+    parser.add_argument("--concurrency", type=int, default=jobqueue.CONCURRENCY, help="jobs run at once")
+    parser.add_argument("--poll", type=float, default=jobqueue.WORKER_POLL_SECONDS,
+                        help="seconds between queue checks; submissions from the API are picked up on the next check")
+    parser.add_argument("--once", action="store_true", help="drain the queue and exit")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    migrate()
+    if args.once:
+        logging.getLogger("worker").info("processed %s", process_queue(args.concurrency))
+        return
+    pool = WorkerPool(concurrency=args.concurrency, poll_seconds=args.poll).start()
+    logging.getLogger("worker").info("worker %s started with concurrency %d", pool.worker_id, args.concurrency)
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    stop.wait()
+    # Finish running jobs; anything killed mid-run is reclaimed once its lease expires.
+    pool.shutdown(wait=True)
+
+if __name__ == "__main__":
+    main()